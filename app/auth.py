@@ -1,34 +1,48 @@
 import os
+import threading
 import bcrypt
-import boto3
-import psycopg2
-from psycopg2 import pool
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Database connection pool
-connection_pool = psycopg2.pool.SimpleConnectionPool(
-    minconn=int(os.getenv('DB_POOL_MIN', 1)),
-    maxconn=int(os.getenv('DB_POOL_MAX', 5)),
-    host=os.getenv('RDS_HOST'),
-    port=os.getenv('RDS_PORT'),
-    database=os.getenv('RDS_DB'),
-    user=os.getenv('RDS_USER'),
-    password=os.getenv('RDS_PASSWORD')
-)
+# Database pool and AWS client are created on first use, not at import
+_connection_pool = None
+_rekognition = None
+_init_lock = threading.Lock()
 
-# AWS Rekognition client
-rekognition = boto3.client('rekognition',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name='us-east-1'
-)
+def _get_connection_pool():
+    global _connection_pool
+    with _init_lock:
+        if _connection_pool is None:
+            from psycopg2 import pool
+            _connection_pool = pool.SimpleConnectionPool(
+                minconn=int(os.getenv('DB_POOL_MIN', 1)),
+                maxconn=int(os.getenv('DB_POOL_MAX', 5)),
+                host=os.getenv('RDS_HOST'),
+                port=os.getenv('RDS_PORT'),
+                database=os.getenv('RDS_DB'),
+                user=os.getenv('RDS_USER'),
+                password=os.getenv('RDS_PASSWORD')
+            )
+    return _connection_pool
+
+def _get_rekognition():
+    global _rekognition
+    with _init_lock:
+        if _rekognition is None:
+            import boto3
+            _rekognition = boto3.client('rekognition',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name='us-east-1'
+            )
+    return _rekognition
 
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def authenticate_face(image_bytes):
+    rekognition = _get_rekognition()
     try:
         response = rekognition.search_faces_by_image(
             CollectionId=os.getenv('REKOGNITION_COLLECTION'),
@@ -43,6 +57,7 @@ def authenticate_face(image_bytes):
     return None
 
 def get_user_by_face(face_id):
+    connection_pool = _get_connection_pool()
     conn = connection_pool.getconn()
     try:
         with conn.cursor() as cur:
@@ -52,6 +67,7 @@ def get_user_by_face(face_id):
         connection_pool.putconn(conn)
 
 def get_user_by_username(username):
+    connection_pool = _get_connection_pool()
     conn = connection_pool.getconn()
     try:
         with conn.cursor() as cur:
@@ -0,0 +1,254 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from config import load_config
+from detector_pool import pin_threads
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, or None where getrusage is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, 1)  # Bytes on macOS, KiB elsewhere
+
+
+def load_frames(spec: str, count: int, seed: int = 0) -> List[np.ndarray]:
+    """Frames for one benchmark set.
+
+    ``spec`` is ``synthetic:WIDTHxHEIGHT`` for seeded random frames, a
+    directory of images, or a video file (its first ``count`` frames).
+    """
+    import cv2
+    if spec.startswith("synthetic:"):
+        width, height = (int(v) for v in spec.split(":", 1)[1].lower().split("x"))
+        rng = np.random.default_rng(seed)
+        return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+    path = Path(spec)
+    if path.is_dir():
+        images = sorted(p for p in path.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)[:count]
+        frames = [frame for frame in (cv2.imread(str(p)) for p in images) if frame is not None]
+    else:
+        cap = cv2.VideoCapture(str(path))
+        frames = []
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from '{spec}'")
+    return frames
+
+
+def summarize_latencies(seconds: Sequence[float]) -> Dict:
+    """Latency percentiles in milliseconds."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]).tolist()
+    return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3),
+            "mean": round(float(ms.mean()), 3), "max": round(float(ms.max()), 3)}
+
+
+def run_case(detector, frames: List[np.ndarray], profile: str, batch_size: int,
+             warmup_batches: int = 2, repeats: int = 3) -> Dict:
+    """Time detect_batch over ``frames`` in batches of ``batch_size``, bypassing the result cache."""
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+    for batch in batches[:warmup_batches]:
+        detector.detect_batch(batch, batch_size=batch_size, profile=profile, annotate=False, use_cache=False)
+    latencies = []
+    processed = 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            batch_start = time.perf_counter()
+            detector.detect_batch(batch, batch_size=batch_size, profile=profile, annotate=False, use_cache=False)
+            latencies.append(time.perf_counter() - batch_start)
+            processed += len(batch)
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": processed,
+        "batch_latency_ms": summarize_latencies(latencies),
+        "frame_latency_ms": summarize_latencies([t / len(b) for t, b in zip(latencies, batches * repeats)]),
+        "fps": round(processed / elapsed, 2) if elapsed > 0 else None,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+@contextmanager
+def pinned_threads(config: Dict, threads: int):
+    """pin_threads for the ``with`` block, restoring OMP_NUM_THREADS and torch's thread count afterwards.
+
+    ``threads`` of 0 leaves the library defaults alone, so cases measured
+    with it are not skewed by an earlier case's pin.
+    """
+    omp_threads = os.environ.get("OMP_NUM_THREADS")
+    try:
+        import torch
+        torch_threads = torch.get_num_threads()
+    except ImportError:
+        torch, torch_threads = None, None
+    if threads:
+        pin_threads(config, threads)
+    try:
+        yield
+    finally:
+        if omp_threads is None:
+            os.environ.pop("OMP_NUM_THREADS", None)
+        else:
+            os.environ["OMP_NUM_THREADS"] = omp_threads
+        if torch is not None:
+            torch.set_num_threads(torch_threads)
+
+
+def case_key(case: Dict) -> str:
+    return f"{case['backend']}/{case['threads']}/{case['frame_set']}/{case['profile']}/{case['batch_size']}"
+
+
+def run_benchmark(frame_sets: Sequence[str], profiles: Sequence[str], batch_sizes: Sequence[int],
+                  backends: Sequence[str], threads: Sequence[int], config: Optional[Dict] = None) -> Dict:
+    """Every combination of backend, thread count, frame set, profile and batch size.
+
+    One detector is loaded per backend and thread count; its load time
+    includes the warmup inference. Peak RSS is the process-wide high-water
+    mark, so it only grows across cases run in the same process.
+    """
+    from detection import PPEDetector
+    base_config = config or load_config()
+    settings = base_config.get("benchmark", {})
+    frame_count = settings.get("frames", 64)
+    loaded_sets = {spec: load_frames(spec, frame_count) for spec in frame_sets}
+    cases = []
+    detector_version = None
+    for backend in backends:
+        for thread_count in threads:
+            config = json.loads(json.dumps(base_config))  # Each detector gets its own copy
+            config.setdefault("inference", {})["backend"] = backend
+            config.setdefault("cache", {})["enabled"] = False  # Repeated frames must reach the model
+            with pinned_threads(config, thread_count):
+                load_start = time.perf_counter()
+                detector = PPEDetector(config)
+                load_seconds = time.perf_counter() - load_start
+                detector_version = detector.backend.version
+                if detector.backend.name != backend:
+                    logger.warning(f"Backend '{backend}' unavailable, measuring '{detector.backend.name}' instead")
+                for spec, frames in loaded_sets.items():
+                    for profile in profiles:
+                        for batch_size in batch_sizes:
+                            case = {
+                                "backend": detector.backend.name,
+                                "threads": thread_count,
+                                "frame_set": spec,
+                                "resolution": f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+                                "profile": profile,
+                                "batch_size": batch_size,
+                                "load_seconds": round(load_seconds, 3)
+                            }
+                            case.update(run_case(detector, frames, profile, batch_size,
+                                                 warmup_batches=settings.get("warmup_batches", 2),
+                                                 repeats=settings.get("repeats", 3)))
+                            logger.info(f"{case_key(case)}: {case['fps']} FPS, "
+                                        f"p95 {case['batch_latency_ms']['p95']} ms per batch")
+                            cases.append(case)
+                del detector
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": detector_version
+        },
+        "cases": cases
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float = 0.15) -> List[str]:
+    """Cases whose p95 batch latency or FPS regressed by more than ``tolerance`` against the baseline.
+
+    Cases missing from either side are not compared.
+    """
+    previous = {case_key(case): case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in report["cases"]:
+        base = previous.get(case_key(case))
+        if base is None:
+            continue
+        p95, base_p95 = case["batch_latency_ms"]["p95"], base["batch_latency_ms"]["p95"]
+        if p95 is not None and base_p95 and p95 > base_p95 * (1 + tolerance):
+            regressions.append(f"{case_key(case)}: p95 latency {p95} ms vs baseline {base_p95} ms")
+        if case["fps"] is not None and base["fps"] and case["fps"] < base["fps"] * (1 - tolerance):
+            regressions.append(f"{case_key(case)}: {case['fps']} FPS vs baseline {base['fps']} FPS")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    config = load_config()
+    settings = config.get("benchmark", {})
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmark of the PPE detector.")
+    parser.add_argument("--frames", action="append", default=None,
+                        help="synthetic:WxH, an image directory or a video file (repeatable)")
+    parser.add_argument("--count", type=int, default=settings.get("frames", 64), help="Frames per frame set")
+    parser.add_argument("--profiles", default="balanced", help="Comma-separated inference profiles")
+    parser.add_argument("--batch-sizes", default="1,8", help="Comma-separated batch sizes")
+    parser.add_argument("--backends", default=config.get("inference", {}).get("backend", "torch"),
+                        help="Comma-separated backends (torch, onnx)")
+    parser.add_argument("--threads", default="0", help="Comma-separated CPU thread counts; 0 = library default")
+    parser.add_argument("--repeats", type=int, default=settings.get("repeats", 3))
+    parser.add_argument("--warmup", type=int, default=settings.get("warmup_batches", 2), help="Untimed batches")
+    parser.add_argument("--output", default=None, help="JSON report path (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Report to compare against; regressions exit with 1")
+    parser.add_argument("--save-baseline", default=None, help="Also write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=settings.get("tolerance", 0.15),
+                        help="Allowed relative regression in p95 latency and FPS")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    config["benchmark"] = dict(settings, frames=args.count, repeats=args.repeats, warmup_batches=args.warmup)
+    report = run_benchmark(
+        args.frames or ["synthetic:640x480", "synthetic:1920x1080"],
+        profiles=[p.strip() for p in args.profiles.split(",") if p.strip()],
+        batch_sizes=[int(b) for b in args.batch_sizes.split(",")],
+        backends=[b.strip() for b in args.backends.split(",") if b.strip()],
+        threads=[int(t) for t in args.threads.split(",")],
+        config=config
+    )
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+        logger.info(f"Report written to {args.output}")
+    else:
+        print(text)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text)
+        logger.info(f"Baseline written to {args.save_baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+from config import load_config
+from metrics import REGISTRY
+from stream_processor import LatestFrameGrabber, StreamResult
+
+logger = logging.getLogger(__name__)
+
+# Called with (camera_id, result) for every processed frame
+ResultCallback = Callable[[str, StreamResult], None]
+
+
+class Camera:
+    """One source registered with the scheduler, plus its scheduling state."""
+
+    def __init__(self, camera_id: str, source: Union[str, int], weight: int = 1, priority: int = 0,
+                 max_fps: Optional[float] = None, profile: Optional[str] = None, realtime: Optional[bool] = None):
+        self.camera_id = camera_id
+        self.source = source
+        self.weight = max(1, int(weight))
+        self.priority = priority  # Higher runs first, e.g. hazardous zones
+        self.max_fps = max_fps  # None = no budget, as fast as capacity allows
+        self.profile = profile
+        self.grabber = LatestFrameGrabber(source, realtime=realtime)
+        self.pending = None  # Frame taken from the grabber, waiting for a batch slot
+        self.credit = 0  # Smooth weighted round-robin counter
+        self.last_dispatch = 0.0
+        self.waiting_since: Optional[float] = None
+        self.frames_processed = 0
+        self.starvation_boosts = 0
+        # Registered so each camera's lag is exported; ids become part of a Prometheus metric name
+        self.lag = REGISTRY.histogram(f"camera_lag_seconds_{re.sub(r'[^a-zA-Z0-9_]', '_', str(camera_id))}",
+                                      f"Capture to result latency of camera {camera_id}")
+        self._recent = deque(maxlen=64)  # Result times for the achieved-FPS window
+
+    def budget_allows(self, now: float) -> bool:
+        return self.max_fps is None or now - self.last_dispatch >= 1.0 / self.max_fps
+
+    def waited(self, now: float) -> float:
+        """Seconds the pending frame has been eligible but not dispatched (time over budget excluded)."""
+        eligible_since = self.waiting_since
+        if self.max_fps is not None:
+            eligible_since = max(eligible_since, self.last_dispatch + 1.0 / self.max_fps)
+        return now - eligible_since
+
+    def achieved_fps(self, now: float) -> float:
+        recent = [t for t in self._recent if now - t <= 10.0]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(now - recent[0], 1e-6)
+
+    def stats(self, now: float) -> Dict:
+        lag = self.lag.snapshot()
+        return {
+            "priority": self.priority,
+            "weight": self.weight,
+            "fps_budget": self.max_fps,
+            "achieved_fps": round(self.achieved_fps(now), 2),
+            "frames_captured": self.grabber.frames_captured,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.grabber.frames_dropped,
+            "lag_avg_seconds": lag["sum"] / lag["count"] if lag["count"] else 0.0,
+            "lag_p95_seconds": self.lag.quantile(0.95),
+            "waiting_seconds": round(now - self.waiting_since, 3) if self.waiting_since is not None else 0.0,
+            "starvation_boosts": self.starvation_boosts,
+            "finished": self.grabber.finished
+        }
+
+
+class CameraScheduler:
+    """Multiplexes several camera feeds onto one shared PPEDetector.
+
+    Every camera keeps only its newest frame. Each round fills one batch of
+    up to ``batch_size`` frames, at most one per camera: cameras whose frame
+    has waited longer than ``starvation_seconds`` go first, then higher
+    priorities, then smooth weighted round-robin. Cameras over their FPS
+    budget sit the round out. Results go to ``callback(camera_id, result)``.
+    """
+
+    def __init__(self, callback: ResultCallback, detector=None, batch_size: Optional[int] = None,
+                 starvation_seconds: Optional[float] = None, annotate: Union[bool, str] = False):
+        scheduler_config = load_config().get("scheduler", {})
+        self.callback = callback
+        self._detector = detector
+        self.batch_size = max(1, batch_size or scheduler_config.get("batch_size", 8))
+        self.starvation_seconds = (starvation_seconds if starvation_seconds is not None
+                                   else scheduler_config.get("starvation_seconds", 2.0))
+        self.annotate = annotate
+        self.cameras: Dict[str, Camera] = {}
+        self.rounds = 0
+        self.batch_sizes = REGISTRY.histogram("scheduler_batch_size", "Frames per scheduler round",
+                                              (1, 2, 3, 4, 6, 8, 12, 16, 24, 32), unit="count")
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def detector(self):
+        if self._detector is None:
+            from detection import get_detector
+            self._detector = get_detector()
+        return self._detector
+
+    def add_camera(self, camera_id: str, source: Union[str, int], **options) -> Camera:
+        """Register a feed; ``options`` are Camera's weight, priority, max_fps, profile and realtime."""
+        camera = Camera(camera_id, source, **options)
+        with self._lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"Camera '{camera_id}' is already registered")
+            self.cameras[camera_id] = camera
+        if self._thread is not None:
+            camera.grabber.start()
+        return camera
+
+    def remove_camera(self, camera_id: str):
+        with self._lock:
+            camera = self.cameras.pop(camera_id, None)
+        if camera is not None:
+            camera.grabber.stop()
+
+    def start(self) -> "CameraScheduler":
+        for camera in list(self.cameras.values()):
+            camera.grabber.start()
+        self._thread = threading.Thread(target=self._run, name="camera-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        for camera in list(self.cameras.values()):
+            camera.grabber.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "CameraScheduler":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _take_frames(self, now: float):
+        for camera in self.cameras.values():
+            item = camera.grabber.latest(timeout=0)
+            if item is not None:
+                if camera.pending is not None:
+                    camera.grabber.count_dropped()  # Replaced before it got a slot
+                camera.pending = item
+                if camera.waiting_since is None:
+                    camera.waiting_since = now
+
+    def select(self, now: float) -> List[Camera]:
+        """Cameras that get a slot in this round, in dispatch order."""
+        with self._lock:
+            self._take_frames(now)
+            ready = [c for c in self.cameras.values() if c.pending is not None and c.budget_allows(now)]
+            starving = [c for c in ready if c.waited(now) >= self.starvation_seconds]
+            chosen = sorted(starving, key=lambda c: -c.waited(now))[:self.batch_size]
+            for camera in chosen:
+                camera.starvation_boosts += 1
+            rest = [c for c in ready if c not in chosen]
+            total_weight = sum(c.weight for c in rest)
+            for camera in rest:
+                camera.credit += camera.weight
+            # Priority first; within a priority the camera owed the most turns
+            for camera in sorted(rest, key=lambda c: (-c.priority, -c.credit)):
+                if len(chosen) >= self.batch_size:
+                    break
+                camera.credit -= total_weight
+                chosen.append(camera)
+            return chosen
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            now = time.perf_counter()
+            # Checked before select() drains the grabbers, so a frame published just before its source
+            # finished is still taken and processed rather than silently lost
+            ended = bool(self.cameras) and all(c.grabber.finished for c in list(self.cameras.values()))
+            chosen = self.select(now)
+            if not chosen:
+                if ended and all(c.pending is None for c in list(self.cameras.values())):
+                    break  # Every source has ended
+                self._stop_event.wait(0.005)
+                continue
+            self.rounds += 1
+            self.batch_sizes.observe(len(chosen))
+            self._dispatch(chosen, now)
+
+    def _dispatch(self, cameras: List[Camera], now: float):
+        items = []
+        for camera in cameras:
+            items.append(camera.pending)
+            camera.pending = None
+            camera.waiting_since = None
+            camera.last_dispatch = now
+
+        # Cameras on the same profile share one forward pass
+        groups: Dict[Optional[str], List[int]] = {}
+        for index, camera in enumerate(cameras):
+            profile = camera.profile or self.detector.resolve_profile(None, camera.camera_id, source="stream")["name"]
+            groups.setdefault(profile, []).append(index)
+
+        for profile, indices in groups.items():
+            try:
+                results = self.detector.detect_batch([items[i][3] for i in indices], profile=profile,
+                                                     batch_size=len(indices), annotate=self.annotate,
+                                                     use_cache=False)  # Live frames never repeat
+            except Exception as e:
+                logger.error(f"Scheduler batch for profile {profile} failed: {e}")
+                continue
+            done = time.perf_counter()
+            for i, (annotated, violations, metrics) in zip(indices, results):
+                camera = cameras[i]
+                frame_index, captured_at, captured_perf, frame = items[i]
+                latency = done - captured_perf
+                camera.lag.observe(latency)
+                camera.frames_processed += 1
+                camera._recent.append(done)
+                for violation in violations:
+                    violation.update({"timestamp": captured_at, "frame": frame_index, "camera_id": camera.camera_id})
+                try:
+                    self.callback(camera.camera_id, StreamResult(frame_index, captured_at, frame, annotated,
+                                                                 violations, metrics, latency))
+                except Exception as e:
+                    logger.error(f"Result callback for camera {camera.camera_id} failed: {e}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-camera achieved FPS, lag, drops and starvation boosts."""
+        now = time.perf_counter()
+        with self._lock:
+            return {camera_id: camera.stats(now) for camera_id, camera in self.cameras.items()}
+
+
+def compliance_logger(db, location: str = "Unknown") -> ResultCallback:
+    """Scheduler callback that writes frames with violations to compliance_logs, tagged with their camera."""
+    def log(camera_id: str, result: StreamResult):
+        if result.violations:
+            db.log_violation({
+                'violations': result.violations,
+                'image_path': None,
+                'location': location,
+                'camera_id': camera_id,
+                'employee_id': None
+            })
+    return log
+
+
+def scheduler_from_config(callback: ResultCallback, detector=None) -> CameraScheduler:
+    """Scheduler with the cameras listed under ``scheduler.cameras`` registered."""
+    scheduler = CameraScheduler(callback, detector=detector)
+    for camera in load_config().get("scheduler", {}).get("cameras", []):
+        options = dict(camera)
+        scheduler.add_camera(options.pop("camera_id"), options.pop("source"), **options)
+    return scheduler
+
+
+__all__ = ["Camera", "CameraScheduler", "compliance_logger", "scheduler_from_config"]
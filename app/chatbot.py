@@ -2,6 +2,7 @@ import streamlit as st
 import logging
 import re
 from database import ComplianceDB
+from metrics import REGISTRY
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -82,6 +83,8 @@ def match_pattern(question):
             return pattern
     return None
 
+_QUERY_SECONDS = REGISTRY.histogram("chatbot_db_query_seconds", "Database round trip answering a chatbot question")
+
 class PPEComplianceChatbot:
     def __init__(self):
         self.db = ComplianceDB()
@@ -100,7 +103,7 @@ class PPEComplianceChatbot:
 
         # Compliance queries
         try:
-            with self.db._managed_cursor() as cur:
+            with _QUERY_SECONDS.timer(), self.db._managed_cursor() as cur:
                 # Total violations
                 if "total violations" in q:
                     cur.execute("SELECT SUM(violations_count) FROM compliance_logs;")
@@ -21,7 +21,118 @@ def load_config():
         },
         "detection": {
             "confidence_threshold": 0.7,
-            "iou_threshold": 0.45
+            "iou_threshold": 0.45,
+            "batch_size": 8,  # Frames stacked into one forward pass
+            "pipeline_queue_size": 32,  # Bounded decode/encode queues between video stages
+            "seek_min_gap_seconds": 2.0,  # Sampling gaps at least this long seek instead of grabbing
+            # Latency/accuracy trade-offs; unset keys fall back to the thresholds above
+            "profiles": {
+                "realtime": {"augment": False, "imgsz": 480, "max_det": 100},
+                "balanced": {"augment": False, "imgsz": 640, "max_det": 300},
+                "accurate": {"augment": True, "imgsz": 640, "max_det": 300},  # Test-time augmentation
+                "highres": {"augment": False, "imgsz": 640, "max_det": 300, "tiled": True}  # 4K cameras
+            },
+            "default_profiles": {
+                "image": "accurate",  # Single-image audits can afford the slow path
+                "video": "realtime",
+                "stream": "realtime",
+                "default": "balanced"
+            },
+            "camera_profiles": {},  # camera_id -> profile name
+            # Profiles with "tiled" run large frames as overlapping model-sized tiles
+            "tiling": {
+                "tile_size": 640,
+                "overlap": 0.2,  # Fraction of a tile shared with its neighbour
+                "min_size": 1280,  # Frames whose longer side is at most this are not tiled
+                "coarse_pass": True,  # Full-frame pass first; only tiles overlapping its boxes run
+                "coarse_conf": 0.25,  # Confidence for a coarse box to mark its tiles as worth running
+                "max_tiles": 16,  # Upper bound on tiles per frame when the coarse pass picks them
+                "merge_threshold": 0.6  # Intersection over the smaller box that merges cross-tile duplicates
+            },
+            # Reuse the previous results for video frames that barely changed
+            "motion_gate": {
+                "enabled": False,
+                "threshold": 0.01,  # Fraction of changed pixels that counts as motion
+                "pixel_delta": 25,  # Grey-level change for a pixel to count as changed
+                "max_stale_seconds": 10.0  # Force a detector pass at least this often
+            }
+        },
+        "inference": {
+            "backend": "torch",  # "torch" (ultralytics) or "onnx" (onnxruntime, CPU)
+            "onnx_model": "ppe_yolo_model.onnx",  # Looked up in model_dir, then models/
+            "int8_model": "ppe_yolo_model.int8.onnx",  # Written by models/quantize.py
+            "use_int8": False,  # Prefer the INT8 model when the ONNX backend is selected
+            "intra_op_threads": 0,  # 0 = onnxruntime default (all physical cores)
+            "inter_op_threads": 1
+        },
+        "pool": {
+            "enabled": False,  # Serve detect_ppe/process_video from worker processes
+            "workers": 0,  # 0 = half the CPU cores
+            "threads_per_worker": 0,  # 0 = cores divided evenly between workers
+            "max_retries": 1  # Resubmissions after a worker crash
+        },
+        "parallel_video": {
+            "enabled": False,  # Split long videos into segments processed by worker processes
+            "segments": 0,  # 0 = one per worker
+            "min_seconds": 120  # Shorter videos are not worth starting workers for
+        },
+        "micro_batching": {
+            "enabled": False,  # Coalesce concurrent detect_ppe calls into batched passes
+            "max_batch_size": 8,
+            "max_wait_ms": 10.0  # Longest a request waits for others to join its batch
+        },
+        "cache": {
+            "enabled": True,  # Answer repeated images from cached detections
+            "max_entries": 256,  # In-memory LRU entries (boxes only, a few KB each)
+            "disk_dir": None,  # Directory for a persistent tier shared by worker processes
+            "disk_max_mb": 256  # Disk tier size before least recently used entries are evicted
+        },
+        "scheduler": {
+            "batch_size": 8,  # Frames from different cameras per shared forward pass
+            "starvation_seconds": 2.0,  # A ready frame waiting this long jumps the priority order
+            # [{"camera_id": ..., "source": ..., "weight": 1, "priority": 0, "max_fps": 5.0, "profile": None}]
+            "cameras": []
+        },
+        "clips": {
+            "output_mode": "video",  # "video": whole annotated video, "clips": only clips around violations
+            "pre_roll_seconds": 2.0,  # Footage kept before the first violation of an event
+            "post_roll_seconds": 2.0  # Footage kept after the last violation of an event
+        },
+        "checkpoint": {
+            "enabled": False,  # Save process_video progress to a sidecar file next to the video
+            "every_frames": 300  # Processed frames between checkpoints
+        },
+        "sampling": {
+            "default_fps": 3.0,  # Long videos are sampled at about this rate unless sample_fps is given
+            "full_below_seconds": 10.0,  # Shorter videos get every frame analysed
+            "adaptive": {
+                "enabled": False,  # Adjust the sampling rate to violation activity and processing speed
+                "min_fps": 0.5,
+                "max_fps": 10.0,
+                "hold_seconds": 2.0,  # Stay at max_fps this long after the last violation
+                "quiet_backoff": 0.85,  # Rate multiplier per compliant frame once the hold expires
+                "static_backoff": 0.6,  # Steeper multiplier when the frame barely changed
+                "realtime_factor": 1.0  # Keep analysis at least this fast relative to playback; 0 = no cap
+            }
+        },
+        "tracking": {
+            "detect_interval": 1,  # Run the detector every K sampled frames; 1 disables tracking
+            "iou_threshold": 0.3,  # Minimum IoU to continue a track
+            "max_missed": 2,  # Detector passes a track may go unmatched before it is dropped
+            "scene_change_threshold": 0.6  # Histogram correlation below this forces a detector pass
+        },
+        "metrics": {
+            "endpoint_enabled": False,  # Serve Prometheus text format on http://host:port/metrics
+            "host": "127.0.0.1",
+            "port": 9108,
+            "textfile": None,  # Also write the exposition to this file, e.g. for node_exporter
+            "textfile_interval_seconds": 15.0
+        },
+        "benchmark": {
+            "frames": 64,  # Frames per frame set
+            "warmup_batches": 2,  # Untimed batches before each case
+            "repeats": 3,  # Passes over the frame set per case
+            "tolerance": 0.15  # Allowed p95 latency / FPS regression against the baseline
         },
         "paths": {
             "model_dir": str(Path(__file__).parent / "models"),
@@ -7,6 +7,7 @@ import time
 from contextlib import contextmanager
 import atexit
 from dotenv import load_dotenv
+from metrics import timed
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -204,6 +205,7 @@ class ComplianceDB:
                 'critical': 0
             }
 
+    @timed("db_log_violation_seconds", "Writing a compliance log and its violations to the database")
     def log_violation(self, violation_data):
         """
         Log a PPE violation or a list of violations to the compliance_logs and violation_details tables.
@@ -1,28 +1,149 @@
 import logging
+import os
+import threading
+import time
 from pathlib import Path
-from typing import Tuple, Dict, List, Optional
+from typing import Any, Tuple, Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
 import numpy as np
-from ultralytics import YOLO
 from config import load_config
+from detector_pool import get_detector_pool
+from micro_batcher import MicroBatcher, run_inline
+from event_clips import ClipRecorder
+from tiling import merge_detections, select_tiles, tile_grid
+from tracking import TrackingSession
+from detection_cache import cache_from_config, cache_key
+from inference_backends import InferenceBackend, RawDetections, UltralyticsBackend, create_backend, letterbox, scale_boxes
+from metrics import REGISTRY
+from video_checkpoint import VideoCheckpoint, concat_parts, part_path
+from violation_batch import ViolationBatch
+from video_pipeline import AdaptiveSampler, FrameReader, FrameSampler, FrameWriter, MotionGate, StageStats, VideoTotals
 
 logger = logging.getLogger(__name__)
 
+# Per-class role used by the vectorized post-processing
+_KIND_OTHER, _KIND_OK, _KIND_VIOLATION = 0, 1, 2
+_KIND_COLORS = {
+    _KIND_OTHER: (255, 255, 0),  # Yellow for non-critical items
+    _KIND_OK: (0, 255, 0),  # Green for proper PPE
+    _KIND_VIOLATION: (0, 0, 255)  # Red for missing PPE
+}
+
+# Hot-path stage timers, exported through metrics.render_prometheus
+_PREPROCESS_SECONDS = REGISTRY.histogram("detect_preprocess_seconds", "Letterbox to the model input size per forward pass")
+_PREDICT_SECONDS = REGISTRY.histogram("detect_predict_seconds", "Model forward pass including NMS")
+_POSTPROCESS_SECONDS = REGISTRY.histogram("detect_postprocess_seconds", "Thresholding and violation rules per frame")
+_ANNOTATE_SECONDS = REGISTRY.histogram("detect_annotate_seconds", "Drawing boxes and labels per frame")
+
+class AnnotatedFrame:
+    """Detections for one frame, drawn onto the frame only when render() is called.
+
+    Holds a reference to the source frame rather than a copy, so the caller
+    must not modify that frame before rendering.
+    """
+
+    __slots__ = ("image", "names", "confidences", "boxes", "kinds", "_rendered")
+
+    def __init__(self, image: np.ndarray, names: List[str], confidences: List[float],
+                 boxes: List[List[int]], kinds: List[int]):
+        self.image = image
+        self.names = names
+        self.confidences = confidences
+        self.boxes = boxes
+        self.kinds = kinds
+        self._rendered = None
+
+    def render(self) -> np.ndarray:
+        """Copy of the frame with every kept box and label drawn on it."""
+        import cv2
+        if self._rendered is not None:
+            return self._rendered
+        start = time.perf_counter()
+        annotated = self.image.copy()
+        for name, conf, (x1, y1, x2, y2), kind in zip(self.names, self.confidences, self.boxes, self.kinds):
+            color = _KIND_COLORS[kind]
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(
+                annotated,
+                f"{name}: {conf:.2f}",
+                (x1, y1 - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                color,
+                2
+            )
+        self._rendered = annotated
+        _ANNOTATE_SECONDS.observe(time.perf_counter() - start)
+        return annotated
+
+    def __array__(self, dtype=None, copy=None):
+        rendered = self.render()
+        return rendered if dtype is None else rendered.astype(dtype)
+
+class FrameDetections(NamedTuple):
+    """One sampled video frame's results, as yielded by iter_video_detections."""
+    frame_number: int  # 1-based
+    timestamp: float  # Seconds into the video
+    annotated: Any  # Lazily drawn AnnotatedFrame when requested, else None
+    violations: List[Dict]
+    metrics: Dict  # This frame's detection metrics
+    totals: Dict  # Running video totals up to and including this frame
+
 class PPEDetector:
     """Optimized PPE Detection with YOLO model focusing on critical safety items."""
 
-    def __init__(self):
-        self.config = load_config()
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or load_config()
         self.model_dir = Path(self.config["paths"]["model_dir"])
         self.output_dir = Path(self.config["paths"]["output_dir"])
         self.classes = self.config["models"]["classes"]
         self.conf_threshold = self.config["detection"].get("confidence_threshold", 0.6)
         self.iou_threshold = self.config["detection"].get("iou_threshold", 0.45)
+        self.batch_size = self.config["detection"].get("batch_size", 8)
+        self.pipeline_queue_size = self.config["detection"].get("pipeline_queue_size", 32)
+        self.seek_min_gap_seconds = self.config["detection"].get("seek_min_gap_seconds", 2.0)
+        self.profiles = self.config["detection"].get("profiles", {"balanced": {}})
+        self.default_profiles = self.config["detection"].get("default_profiles", {})
+        self.camera_profiles = self.config["detection"].get("camera_profiles", {})
+        self.tiling = self.config["detection"].get("tiling", {})
         self.critical_ppe = {"helmet", "gloves", "mask", "shoes"}  # Focus on these critical items
-        self.model = self._load_model()
+        self._class_kinds = self._build_class_kinds()
+        self.backend = self._load_model()
+        self.cache = cache_from_config(self.config)
         self._warmup_model()
 
-    def _load_model(self):
+    def _load_model(self) -> InferenceBackend:
+        """Load the configured inference backend, falling back to PyTorch."""
+        if self.config.get("inference", {}).get("backend", "torch") == "onnx":
+            backend = self._load_onnx_model()
+            if backend is not None:
+                return backend
+            logger.warning("No usable ONNX model found, falling back to the PyTorch backend")
+        return self._load_torch_model()
+
+    def _load_onnx_model(self) -> Optional[InferenceBackend]:
+        """Load an exported ONNX model with onnxruntime, preferring the INT8 one when enabled."""
+        inference = self.config.get("inference", {})
+        model_names = [inference.get("onnx_model", "ppe_yolo_model.onnx")]
+        if inference.get("use_int8", False):
+            model_names.insert(0, inference.get("int8_model", "ppe_yolo_model.int8.onnx"))
+        candidates = [directory / name for name in model_names for directory in (self.model_dir, Path("models"))]
+        for path in candidates:
+            if not path.exists():
+                continue
+            try:
+                logger.info(f"Loading ONNX PPE model from {path}")
+                backend = create_backend(self.config, path)
+                if all(item in backend.names.values() for item in self.critical_ppe):
+                    return backend
+                logger.warning(f"Model at {path} doesn't have all required classes")
+            except Exception as e:
+                logger.warning(f"Failed to load ONNX model from {path}: {e}")
+        return None
+
+    def _load_torch_model(self) -> InferenceBackend:
         """Load the best available model with fallback options."""
+        from ultralytics import YOLO
+
         model_paths = [
             self.model_dir / "ppe_yolo_model.pt",  # Primary custom model path
             Path("models/ppe_yolo_v8s.pt"),       # Secondary path with potentially better model
@@ -36,7 +157,7 @@ class PPEDetector:
                     model = YOLO(str(path))
                     # Verify the model has the expected classes
                     if all(item in model.names.values() for item in self.critical_ppe):
-                        return model
+                        return UltralyticsBackend(model, path)
                     logger.warning(f"Model at {path} doesn't have all required classes")
                 except Exception as e:
                     logger.warning(f"Failed to load model from {path}: {e}")
@@ -49,16 +170,25 @@ class PPEDetector:
             self.model_dir.mkdir(parents=True, exist_ok=True)
             save_path = self.model_dir / "ppe_yolo_fallback.pt"
             model.save(str(save_path))
-            return model
+            return UltralyticsBackend(model, save_path)
         except Exception as e:
             logger.error(f"Could not load fallback model: {e}")
             raise
 
+    def _build_class_kinds(self) -> np.ndarray:
+        """Class id -> ok / violation / other lookup for the configured classes."""
+        kinds = np.full(len(self.classes), _KIND_OTHER, dtype=np.int8)
+        for class_id, class_name in enumerate(self.classes):
+            if class_name in self.critical_ppe:
+                kinds[class_id] = _KIND_OK
+            elif class_name.startswith("no_") and class_name[3:] in self.critical_ppe:
+                kinds[class_id] = _KIND_VIOLATION
+        return kinds
+
     def _warmup_model(self):
         """Run a dummy detection to initialize the model."""
-        dummy_image = np.zeros((640, 640, 3), dtype=np.uint8)
         try:
-            self.model.predict(dummy_image, verbose=False)
+            self.backend.warmup()
             logger.info("Model warmup completed")
         except Exception as e:
             logger.warning(f"Model warmup failed: {e}")
@@ -68,78 +198,215 @@ class PPEDetector:
         # This would be more comprehensive in a full implementation
         return detections
 
-    def detect(self, image: np.ndarray, confidence: Optional[float] = None) -> Tuple[np.ndarray, List[Dict], Dict]:
-        """Enhanced PPE detection focusing on critical safety items."""
-        import cv2
-        
-        # Preprocess image
-        img_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if len(image.shape) == 3 else image
-        img_resized = cv2.resize(img_rgb, (640, 640)) if max(image.shape) > 640 else img_rgb
-        
-        # Run detection with enhanced parameters
-        results = self.model.predict(
-            img_resized,
-            conf=confidence or self.conf_threshold,
-            iou=self.iou_threshold,
-            imgsz=640,
-            augment=True,  # Enable test-time augmentation
-            verbose=False
-        )
-        
-        annotated = image.copy()
-        violations = []
-        total_detections = 0
-        confidences = []
-        required_ppe_present = {item: False for item in self.critical_ppe}
-
-        for res in results:
-            for box in res.boxes:
-                class_id = int(box.cls.item())
-                class_name = self.classes[class_id]
-                conf = box.conf.item()
-                
-                # Skip if confidence is too low
-                if conf < (confidence or self.conf_threshold):
-                    continue
-                    
-                total_detections += 1
-                confidences.append(conf)
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
-                # Check for critical PPE items
-                is_violation = False
-                if class_name in self.critical_ppe:
-                    required_ppe_present[class_name] = True
-                    color = (0, 255, 0)  # Green for proper PPE
-                elif class_name.startswith("no_") and class_name[3:] in self.critical_ppe:
-                    is_violation = True
-                    color = (0, 0, 255)  # Red for missing PPE
-                else:
-                    color = (255, 255, 0)  # Yellow for non-critical items
-                
-                # Draw bounding box
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(
-                    annotated,
-                    f"{class_name}: {conf:.2f}",
-                    (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    color,
-                    2
-                )
-                
-                if is_violation:
-                    violations.append({
-                        "violation_type": class_name,
-                        "confidence": conf,
-                        "bbox": (x1, y1, x2, y2),
-                        "critical": True
-                    })
-        
+    def _preprocess(self, image: np.ndarray, imgsz: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        """Letterbox a frame down to the model input size.
+
+        Frames stay BGR: both backends take NumPy input as ultralytics does
+        and convert to RGB themselves. Returns the input with the gain and
+        (left, top) padding that map its boxes back onto the original frame;
+        frames that already fit pass through unchanged.
+        """
+        if max(image.shape[:2]) <= imgsz:
+            return image, 1.0, (0, 0)
+        return letterbox(image, (imgsz, imgsz))
+
+    def resolve_profile(self, profile: Optional[str] = None, camera_id: Optional[str] = None,
+                        source: str = "image") -> Dict:
+        """Pick the inference profile for a call.
+
+        An explicit ``profile`` wins, then the camera's configured profile, then
+        the default for the source type ("image", "video" or "stream").
+        """
+        name = (profile
+                or self.camera_profiles.get(camera_id)
+                or self.default_profiles.get(source)
+                or self.default_profiles.get("default", "balanced"))
+        if name not in self.profiles:
+            raise ValueError(f"Unknown inference profile '{name}'. Available: {sorted(self.profiles)}")
+        settings = {
+            "conf": self.conf_threshold,
+            "iou": self.iou_threshold,
+            "imgsz": 640,
+            "augment": False,
+            "max_det": 300,
+            "tiled": False
+        }
+        settings.update(self.profiles[name])
+        settings["name"] = name
+        return settings
+
+    def detect(self, image: np.ndarray, confidence: Optional[float] = None, profile: Optional[str] = None,
+               camera_id: Optional[str] = None, annotate: Union[bool, str] = True,
+               use_cache: bool = True) -> Tuple[Any, List[Dict], Dict]:
+        """Enhanced PPE detection focusing on critical safety items.
+
+        ``annotate`` controls the first element of the result: True returns the
+        annotated frame, "lazy" an AnnotatedFrame that draws on render(), and
+        False returns None for callers that only need violations and metrics.
+        """
+        return self.detect_batch([image], confidence, batch_size=1, profile=profile, camera_id=camera_id,
+                                 annotate=annotate, use_cache=use_cache)[0]
+
+    def detect_batch(self, images: List[np.ndarray], confidence: Optional[float] = None,
+                     batch_size: Optional[int] = None, profile: Optional[str] = None,
+                     camera_id: Optional[str] = None, annotate: Union[bool, str] = True,
+                     use_cache: bool = True) -> List[Tuple[Any, List[Dict], Dict]]:
+        """Detect PPE on several frames, stacking up to batch_size frames per forward pass.
+
+        Frames already seen with the same model and settings are answered from
+        the detection cache when one is configured; pass ``use_cache=False``
+        for one-off frames such as video, where hashing would be wasted work.
+        """
+        batch_size = max(1, batch_size or self.batch_size)
+        settings = self.resolve_profile(profile, camera_id)
+        conf_threshold = confidence or settings["conf"]
+        outputs = []
+
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            if use_cache and self.cache is not None:
+                detections = self._predict_cached(chunk, settings, conf_threshold)
+            else:
+                detections = self._predict_raw(chunk, settings, conf_threshold)
+            for image, raw in zip(chunk, detections):
+                outputs.append(self._build_result(image, raw, conf_threshold, annotate))
+
+        return outputs
+
+    def _predict_raw(self, images: List[np.ndarray], settings: Dict, conf_threshold: float) -> List[RawDetections]:
+        """One forward pass over ``images`` with the given profile settings.
+
+        Boxes always come back in original-frame coordinates. With a tiled
+        profile, frames larger than ``tiling.min_size`` go through
+        _predict_tiled instead.
+        """
+        if settings.get("tiled"):
+            min_size = self.tiling.get("min_size", 1280)
+            large = [max(image.shape[:2]) > min_size for image in images]
+            if any(large):
+                small_images = [image for image, big in zip(images, large) if not big]
+                small = iter(self._predict_raw(small_images, dict(settings, tiled=False), conf_threshold)
+                             if small_images else [])
+                return [self._predict_tiled(image, settings, conf_threshold) if big else next(small)
+                        for image, big in zip(images, large)]
+        with _PREPROCESS_SECONDS.timer():
+            prepared = [self._preprocess(image, settings["imgsz"]) for image in images]
+        with _PREDICT_SECONDS.timer():
+            detections = self.backend.predict(
+                [inputs for inputs, _, _ in prepared],
+                conf=conf_threshold,
+                iou=settings["iou"],
+                imgsz=settings["imgsz"],
+                augment=settings["augment"],  # Test-time augmentation only where the profile allows it
+                max_det=settings["max_det"]
+            )
+        return [raw if gain == 1.0 else raw._replace(xyxy=scale_boxes(raw.xyxy, gain, pad, image.shape[:2]))
+                for raw, image, (_, gain, pad) in zip(detections, images, prepared)]
+
+    def _predict_cached(self, images: List[np.ndarray], settings: Dict, conf_threshold: float) -> List[RawDetections]:
+        """_predict_raw with cache lookups; only the misses go through the model, as one batch."""
+        keys = [cache_key(image, self.backend.version, settings, conf_threshold) for image in images]
+        detections = [self.cache.get(key) for key in keys]
+        misses = [i for i, raw in enumerate(detections) if raw is None]
+        if misses:
+            for i, raw in zip(misses, self._predict_raw([images[i] for i in misses], settings, conf_threshold)):
+                self.cache.put(keys[i], raw)
+                detections[i] = raw
+        return detections
+
+    def _predict_tiled(self, image: np.ndarray, settings: Dict, conf_threshold: float) -> RawDetections:
+        """Detect on overlapping full-resolution tiles of a large frame.
+
+        An optional coarse full-frame pass picks the tiles that contain
+        anything, which bounds the cost at ``max_tiles`` forward passes; its
+        boxes are merged in too, so objects larger than a tile are not lost.
+        """
+        tile_size = self.tiling.get("tile_size", 640)
+        tiles = tile_grid(image.shape[0], image.shape[1], tile_size, self.tiling.get("overlap", 0.2))
+        predict_options = {"iou": settings["iou"], "augment": settings["augment"], "max_det": settings["max_det"]}
+
+        parts, offsets = [], []
+        if self.tiling.get("coarse_pass", True):
+            coarse_conf = min(self.tiling.get("coarse_conf", 0.25), conf_threshold)
+            with _PREDICT_SECONDS.timer():
+                coarse = self.backend.predict([image], conf=coarse_conf, imgsz=settings["imgsz"], **predict_options)[0]
+            tiles = select_tiles(tiles, coarse.xyxy, coarse.conf, self.tiling.get("max_tiles", 16))
+            parts.append(coarse)
+            offsets.append((0, 0))
+
+        crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        for start in range(0, len(crops), self.batch_size):
+            with _PREDICT_SECONDS.timer():
+                parts.extend(self.backend.predict(crops[start:start + self.batch_size], conf=conf_threshold,
+                                                  imgsz=tile_size, **predict_options))
+        offsets.extend((x1, y1) for x1, y1, _, _ in tiles)
+        return merge_detections(parts, offsets, self.tiling.get("merge_threshold", 0.6), settings["max_det"])
+
+    def _track_frames(self, frames: List[np.ndarray], session: TrackingSession, settings: Dict,
+                      conf_threshold: float, annotate: Union[bool, str]) -> List[Tuple[Any, List[Dict], Dict]]:
+        """Detect-then-track: run the detector only where the session asks for it."""
+        outputs = []
+        for frame in frames:
+            reason = session.redetect_reason(frame)
+            if reason is not None:
+                raw = self._predict_raw([frame], settings, conf_threshold)[0]
+                keep = raw.conf >= conf_threshold
+                raw = RawDetections(raw.xyxy[keep], raw.conf[keep], raw.cls[keep])
+                track_ids = session.tracker.update(raw)
+                session.detected(frame, reason)
+            else:
+                raw, track_ids = session.tracker.predict()
+                session.propagated()
+            outputs.append(self._build_result(frame, raw, conf_threshold, annotate, track_ids))
+        return outputs
+
+    @staticmethod
+    def _reuse_result(image: np.ndarray, previous: Tuple[Any, List[Dict], Dict]) -> Tuple[Any, List[Dict], Dict]:
+        """Repeat another frame's result for ``image``; lazily annotated boxes are redrawn on this frame."""
+        annotated, violations, metrics = previous
+        if isinstance(annotated, AnnotatedFrame):
+            annotated = AnnotatedFrame(image, annotated.names, annotated.confidences, annotated.boxes, annotated.kinds)
+        return annotated, [dict(v) for v in violations], dict(metrics)
+
+    def _build_result(self, image: np.ndarray, raw: RawDetections, conf_threshold: float,
+                      annotate: Union[bool, str] = True,
+                      track_ids: Optional[np.ndarray] = None) -> Tuple[Any, List[Dict], Dict]:
+        """Turn one frame's raw detections into the annotated frame, violations and metrics."""
+        start = time.perf_counter()
+        # Boxes arrive as arrays; threshold and classify them in NumPy
+        class_ids, confs, xyxy = raw.cls, raw.conf, raw.xyxy
+        keep = confs >= conf_threshold
+        class_ids, confs, xyxy = class_ids[keep], confs[keep], xyxy[keep].astype(np.int64)
+        if track_ids is not None:
+            track_ids = track_ids[keep].tolist()
+        kinds = self._class_kinds[class_ids]
+
+        conf_values = confs.tolist()
+        boxes = xyxy.tolist()
+        names = [self.classes[class_id] for class_id in class_ids.tolist()]
+        annotated = None
+        if annotate:
+            annotated = AnnotatedFrame(image, names, conf_values, boxes, kinds.tolist())
+
+        violations = [
+            {
+                "violation_type": names[i],
+                "confidence": conf_values[i],
+                "bbox": tuple(boxes[i]),
+                "critical": True
+            }
+            for i in np.flatnonzero(kinds == _KIND_VIOLATION).tolist()
+        ]
+        if track_ids is not None:
+            for violation, i in zip(violations, np.flatnonzero(kinds == _KIND_VIOLATION).tolist()):
+                violation["track_id"] = track_ids[i]
+
         # Check for completely missing critical PPE (not even detected as missing)
+        present = {self.classes[class_id] for class_id in np.unique(class_ids[kinds == _KIND_OK]).tolist()}
+        required_ppe_present = {item: item in present for item in self.critical_ppe}
+        detected_types = {v["violation_type"] for v in violations}
         for item in self.critical_ppe:
-            if not required_ppe_present[item] and f"no_{item}" not in [v["violation_type"] for v in violations]:
+            if not required_ppe_present[item] and f"no_{item}" not in detected_types:
                 violations.append({
                     "violation_type": f"missing_{item}",
                     "confidence": 0.9,  # High confidence since we didn't detect it at all
@@ -148,116 +415,478 @@ class PPEDetector:
                 })
                 logger.warning(f"Critical PPE item {item} not detected at all")
 
+        total_detections = len(conf_values)
         metrics = {
             "total_detections": total_detections,
             "violation_count": len(violations),
             "critical_violations": sum(1 for v in violations if v.get("critical", False)),
-            "avg_confidence": float(np.mean(confidences)) if confidences else 0.0,
+            "avg_confidence": float(np.mean(conf_values)) if conf_values else 0.0,
             "compliance_rate": 1 - (len(violations) / max(1, total_detections)),
             "missing_ppe": [item for item, present in required_ppe_present.items() if not present]
         }
-        
+        _POSTPROCESS_SECONDS.observe(time.perf_counter() - start)  # Drawing is timed separately by render()
+
+        if annotate and annotate != "lazy":
+            annotated = annotated.render()
         return annotated, violations, metrics
 
-    def process_video(self, video_path: str, output_path: Optional[str] = None) -> Tuple[List[Dict], Dict]:
-        """Optimized video processing with frame skipping for performance."""
+    def iter_video_detections(self, video_path: str, output_path: Optional[str] = None,
+                              sample_fps: Optional[float] = None,
+                              frame_numbers: Optional[Sequence[int]] = None, profile: Optional[str] = None,
+                              camera_id: Optional[str] = None,
+                              detect_interval: Optional[int] = None,
+                              motion_gate: Optional[bool] = None, checkpoint: Optional[bool] = None,
+                              resume: bool = False,
+                              frame_range: Optional[Tuple[int, int]] = None,
+                              output_mode: Optional[str] = None, adaptive: Optional[bool] = None,
+                              annotate: bool = False,
+                              restored: Optional[List[Dict]] = None) -> Iterator[FrameDetections]:
+        """Optimized video processing: decode, batched inference and encode run as overlapping stages.
+
+        A generator that yields one FrameDetections per sampled frame as soon
+        as its batch is through the model, carrying running totals; nothing
+        accumulates per frame, so memory stays flat however long the video.
+        Its return value (``StopIteration.value``) is the final video_metrics.
+        With ``annotate`` every yielded frame carries a lazily drawn
+        AnnotatedFrame; otherwise its ``annotated`` field is None.
+
+        By default long videos are sampled at ``sampling.default_fps`` (3 FPS)
+        and short ones in full. Pass ``sample_fps`` for a different rate, or
+        ``frame_numbers`` (1-based, as in the ``frame`` field of each violation)
+        to analyse specific frames only. With ``adaptive`` (default:
+        ``sampling.adaptive.enabled``) the rate instead rises around violations,
+        backs off on compliant or static footage and is capped to keep up with
+        real time, between the configured min and max rates.
+        The inference profile defaults to the "video" one unless ``profile`` or
+        the camera's configured profile says otherwise.
+
+        With ``detect_interval`` K > 1 the detector runs on every K-th sampled
+        frame (and on scene changes or lost tracks); boxes in between come from
+        an IoU/Kalman tracker, and each violation carries a stable ``track_id``.
+
+        ``motion_gate`` (default: ``detection.motion_gate.enabled``) skips the
+        detector on frames that barely differ from the last analysed one and
+        repeats that frame's results instead.
+
+        With ``checkpoint`` (default: ``checkpoint.enabled``) progress is saved
+        to a sidecar file every few hundred frames and violations to a log next
+        to it, and the output video is written as segments closed at each
+        checkpoint. ``resume=True`` continues from a matching checkpoint instead
+        of frame 1; violations found before the checkpoint are not yielded
+        again but appended to ``restored`` when it is given.
+
+        ``frame_range`` (first, last), 1-based and inclusive, limits the run to
+        the sampled frames inside it; frame numbers and timestamps stay those
+        of the whole video, which is how segmented runs are stitched together.
+
+        ``output_mode`` (default: ``clips.output_mode``) is "video" to write the
+        whole annotated video to ``output_path``, or "clips" to write only short
+        clips around violations next to it, indexed in ``<stem>.clips.json``.
+        """
         import cv2
         video_path = Path(video_path)
         if not video_path.exists():
             raise FileNotFoundError(f"Video not found: {video_path}")
+        clip_config = self.config.get("clips", {})
+        output_mode = output_mode or clip_config.get("output_mode", "video")
+        if output_mode not in ("video", "clips"):
+            raise ValueError(f"Unknown output mode '{output_mode}', expected 'video' or 'clips'")
 
-        violations = []
+        settings = self.resolve_profile(profile, camera_id, source="video")
+        profile_name = settings["name"]
+        tracking_config = self.config.get("tracking", {})
+        detect_interval = detect_interval or tracking_config.get("detect_interval", 1)
+        gate_config = self.config["detection"].get("motion_gate", {})
+        motion_gate = motion_gate if motion_gate is not None else gate_config.get("enabled", False)
+        sampling_config = self.config.get("sampling", {})
+        adaptive_config = sampling_config.get("adaptive", {})
+        adaptive = (adaptive if adaptive is not None else adaptive_config.get("enabled", False)) \
+            and frame_numbers is None
+
+        checkpoint_config = self.config.get("checkpoint", {})
+        checkpointer = None
+        state = None
+        if resume or (checkpoint if checkpoint is not None else checkpoint_config.get("enabled", False)):
+            checkpointer = VideoCheckpoint(video_path, {
+                "sample_fps": sample_fps,
+                "frame_numbers": sorted(frame_numbers) if frame_numbers is not None else None,
+                "profile": profile_name,
+                "detect_interval": detect_interval,
+                "motion_gate": bool(motion_gate),
+                "frame_range": list(frame_range) if frame_range else None,
+                "output": Path(output_path).name if output_path else None,
+                "output_mode": output_mode,
+                "adaptive": adaptive
+            }, every_frames=checkpoint_config.get("every_frames", 300))
+            state = checkpointer.load() if resume else None
+        resumed_from = None
+        if state is None:
+            state = {"last_frame": frame_range[0] - 1 if frame_range else 0, "totals": VideoTotals().to_state(),
+                     "violations_offset": 0, "parts": [], "clips": [], "next_track_id": 1}
+        else:
+            resumed_from = state["last_frame"]
+            logger.info(f"Resuming {video_path.name} after frame {resumed_from}")
+            if restored is not None:
+                restored.extend(checkpointer.read_violations(state["violations_offset"]))
+        if checkpointer is not None:
+            checkpointer.open_log(state["violations_offset"])
+
+        tracking = None
+        if detect_interval > 1:
+            tracking = TrackingSession(
+                detect_interval,
+                iou_threshold=tracking_config.get("iou_threshold", 0.3),
+                max_missed=tracking_config.get("max_missed", 2),
+                scene_change_threshold=tracking_config.get("scene_change_threshold", 0.6),
+                first_track_id=state["next_track_id"]  # Ids stay unique across a resume
+            )
+        gate = None
+        if motion_gate:
+            gate = MotionGate(
+                threshold=gate_config.get("threshold", 0.01),
+                pixel_delta=gate_config.get("pixel_delta", 25),
+                max_stale_seconds=gate_config.get("max_stale_seconds", 10.0)
+            )
+        totals = VideoTotals.from_state(state["totals"])
         cap = cv2.VideoCapture(str(video_path))
         frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        # Adjust processing based on video length
-        skip_frames = max(1, int(fps / 3))  # Process 3 FPS for long videos
-        if total_frames / fps < 10:  # Short videos get full processing
-            skip_frames = 1
+        if adaptive:
+            # Restarts from the base rate after a resume; the sampling history is not checkpointed
+            sampler = AdaptiveSampler(
+                fps,
+                base_fps=sample_fps or sampling_config.get("default_fps", 3.0),
+                min_fps=adaptive_config.get("min_fps", 0.5),
+                max_fps=adaptive_config.get("max_fps", 10.0),
+                hold_seconds=adaptive_config.get("hold_seconds", 2.0),
+                quiet_backoff=adaptive_config.get("quiet_backoff", 0.85),
+                static_backoff=adaptive_config.get("static_backoff", 0.6),
+                realtime_factor=adaptive_config.get("realtime_factor", 1.0)
+            )
+        else:
+            sampler = FrameSampler.for_video(fps, total_frames, sample_fps=sample_fps, frame_numbers=frame_numbers,
+                                             default_fps=sampling_config.get("default_fps", 3.0),
+                                             full_below_seconds=sampling_config.get("full_below_seconds", 10.0))
+
+        def open_writer(path: str) -> FrameWriter:
+            frame_writer = FrameWriter(cv2.VideoWriter(
+                path,
+                cv2.VideoWriter_fourcc(*'avc1'),  # Better codec
+                sampler.output_fps,
+                (frame_width, frame_height)
+            ), queue_size=self.pipeline_queue_size,
+                # Adaptive sampling varies the frame spacing, so frames are placed by timestamp
+                fps=sampler.output_fps if adaptive else None)
+            frame_writer.start()
+            return frame_writer
 
+        def close_writer(frame_writer: FrameWriter):
+            frame_writer.close()
+            frame_writer.writer.release()
+            encode_stats.add(frame_writer.stats)
+
+        # With checkpoints the output is written in segments, so a resume can start a fresh one
+        parts = state["parts"]
         writer = None
+        clips = None
+        encode_stats = StageStats("encode")
         if output_path:
             self.output_dir.mkdir(exist_ok=True)
             output_path = str(self.output_dir / Path(output_path).name)
-            writer = cv2.VideoWriter(
-                output_path,
-                cv2.VideoWriter_fourcc(*'avc1'),  # Better codec
-                fps/skip_frames,
-                (frame_width, frame_height)
-            )
+            if output_mode == "clips":
+                clips = ClipRecorder(output_path, open_writer, close_writer, sampler.output_fps,
+                                     pre_roll_seconds=clip_config.get("pre_roll_seconds", 2.0),
+                                     post_roll_seconds=clip_config.get("post_roll_seconds", 2.0),
+                                     clips=state["clips"])
+            else:
+                writer = open_writer(part_path(output_path, len(parts)) if checkpointer else output_path)
 
-        frame_count = 0
-        processed_frames = 0
-        total_detections = 0
-        confidences = []
-        violation_frames = 0
+        # Decode and encode run on their own threads; inference stays on this one
+        # An adaptive sampler decides ahead by the queue depth, so keep that short
+        queue_size = min(self.pipeline_queue_size, 2 * self.batch_size) if adaptive else self.pipeline_queue_size
+        reader = FrameReader(cap, sampler, queue_size=queue_size,
+                             seek_min_gap=int(self.seek_min_gap_seconds * fps), start_after=state["last_frame"],
+                             end_frame=frame_range[1] if frame_range else None)
+        reader.start()
+        inference_stats = StageStats("inference")
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            if frame_count % skip_frames != 0:
-                continue
-                
-            processed_frames += 1
-            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
-            
-            try:
-                annotated, frame_violations, metrics = self.detect(frame)
-                for violation in frame_violations:
-                    violation.update({
-                        "timestamp": timestamp,
-                        "frame": frame_count,
-                        "frame_time": timestamp
+        processed_frames = totals.processed_frames  # Counts failed batches too, unlike totals
+        last_checkpoint = processed_frames
+        previous = None  # Last frame's result, repeated for frames the motion gate skips
+        last_feedback = time.perf_counter()
+        # Only frames headed for the output video are drawn, on the encoder thread
+        frame_annotate = "lazy" if annotate or writer is not None or clips is not None else False
+
+        def infer_frames(items: List[Tuple[int, float, np.ndarray]]) -> List[Tuple[Any, List[Dict], Dict]]:
+            nonlocal previous
+            frames = [frame for _, _, frame in items]
+            infer = [gate is None or gate.should_infer(frame, timestamp) for _, timestamp, frame in items]
+            if previous is None:
+                infer[0] = True
+            to_infer = [frame for frame, run in zip(frames, infer) if run]
+            if tracking is not None:
+                inferred = self._track_frames(to_infer, tracking, settings, settings["conf"], frame_annotate)
+            else:
+                inferred = self.detect_batch(to_infer, profile=profile_name, annotate=frame_annotate,
+                                             use_cache=False)
+            inferred = iter(inferred)
+            results = []
+            for frame, run in zip(frames, infer):
+                previous = next(inferred) if run else self._reuse_result(frame, previous)
+                results.append(previous)
+            return results
+
+        try:
+            end_of_stream = False
+            while not end_of_stream:
+                batch = []
+                wait_start = time.perf_counter()
+                while len(batch) < self.batch_size:
+                    item = reader.get()
+                    if item is None:
+                        end_of_stream = True
+                        break
+                    batch.append(item)
+                inference_stats.wait_seconds += time.perf_counter() - wait_start
+                if not batch:
+                    break
+
+                processed_frames += len(batch)
+                infer_start = time.perf_counter()
+                try:
+                    done = list(zip(batch, infer_frames(batch)))
+                except Exception as e:
+                    # Retry frame by frame, so one bad frame does not cost the rest of its batch
+                    logger.warning(f"Frames {batch[0][0]}-{batch[-1][0]} failed as a batch ({e}), retrying singly")
+                    done = []
+                    for item in batch:
+                        try:
+                            done.append((item, infer_frames([item])[0]))
+                        except Exception as error:
+                            logger.error(f"Frame {item[0]} processing error: {error}")
+                    totals.processed_frames += len(batch) - len(done)  # Failed frames were processed too
+                finally:
+                    inference_stats.busy_seconds += time.perf_counter() - infer_start
+                inference_stats.items += len(batch)
+                if not done:
+                    continue
+                if adaptive:
+                    # Wall time since the last batch, so slow decoding or a slow consumer count as lag too
+                    now = time.perf_counter()
+                    per_frame = (now - last_feedback) / len(batch)
+                    last_feedback = now
+                    for (_, timestamp, frame), (_, frame_violations, _) in done:
+                        sampler.observe(frame, timestamp, frame_violations, per_frame)
+
+                for (frame_number, timestamp, _), (annotated, frame_violations, metrics) in done:
+                    for violation in frame_violations:
+                        violation.update({
+                            "timestamp": timestamp,
+                            "frame": frame_number,
+                            "frame_time": timestamp
+                        })
+                    totals.add_frame(frame_violations, metrics["total_detections"])
+                    if checkpointer is not None:
+                        checkpointer.log(frame_violations)
+                    if writer is not None:
+                        writer.write(annotated, timestamp)
+                    if clips is not None:
+                        clips.add(frame_number, timestamp, annotated, frame_violations)
+                    yield FrameDetections(frame_number, timestamp, annotated if annotate else None,
+                                          frame_violations, metrics, totals.snapshot())
+
+                if checkpointer is not None and processed_frames - last_checkpoint >= checkpointer.every_frames:
+                    if writer is not None:
+                        # Close the segment so everything the checkpoint covers is safely on disk
+                        close_writer(writer)
+                        parts.append(part_path(output_path, len(parts)))
+                        writer = open_writer(part_path(output_path, len(parts)))
+                    if clips is not None:
+                        clips.close_clip()  # A clip spanning the checkpoint continues in a new file
+                    checkpointer.save({
+                        "last_frame": batch[-1][0],
+                        "totals": totals.to_state(),
+                        "parts": parts,
+                        "clips": clips.clips if clips is not None else [],
+                        "next_track_id": tracking.tracker.next_id if tracking is not None else 1
                     })
-                violations.extend(frame_violations)
-                total_detections += metrics["total_detections"]
-                confidences.extend([v["confidence"] for v in frame_violations])
-                if frame_violations:
-                    violation_frames += 1
-                if writer is not None:
-                    writer.write(annotated)
-            except Exception as e:
-                logger.error(f"Frame {frame_count} processing error: {e}")
-                continue
+                    last_checkpoint = processed_frames
+        finally:
+            reader.stop()
+            reader.join()
+            cap.release()
+            if writer is not None:
+                close_writer(writer)
+            if clips is not None:
+                clips.close_clip()
+            if checkpointer is not None:
+                checkpointer.close_log()
 
-        cap.release()
-        if writer is not None:
-            writer.release()
+        if reader.error is not None:
+            raise RuntimeError(f"Video decoding failed: {reader.error}")
+        if checkpointer is not None:
+            if writer is not None:
+                parts.append(part_path(output_path, len(parts)))
+                concat_parts(parts, output_path, sampler.output_fps, (frame_width, frame_height))
+            checkpointer.remove()
+        if clips is not None:
+            clips.write_index()
+        # A frame list may stop well before the end; fall back to the container's count
+        frame_count = reader.frames_read if reader.reached_end else max(reader.frames_read, total_frames)
 
-        video_metrics = {
-            "total_frames": frame_count,
-            "processed_frames": processed_frames,
-            "total_detections": total_detections,
-            "total_violations": len(violations),
-            "critical_violations": sum(1 for v in violations if v.get("critical", False)),
-            "avg_confidence": float(np.mean(confidences)) if confidences else 0.0,
-            "violation_frames": violation_frames,
-            "compliance_rate": 1 - (len(violations) / total_detections) if total_detections > 0 else 1.0,
-            "processing_fps": processed_frames / (frame_count / fps) if frame_count > 0 else 0
-        }
-        
-        logger.info(f"Processed {processed_frames}/{frame_count} frames with {len(violations)} violations")
+        totals.processed_frames = processed_frames
+        video_metrics = totals.summary(frame_count, fps)
+        video_metrics.update({
+            "profile": profile_name,
+            "motion_gate": gate.as_dict() if gate is not None else None,
+            "adaptive_sampling": sampler.as_dict() if adaptive else None,
+            "clips": clips.summary() if clips is not None else None,
+            "checkpoint": {
+                "resumed_from_frame": resumed_from,
+                "checkpoints_written": checkpointer.written
+            } if checkpointer is not None else None,
+            "tracking": dict(
+                tracking.summary(),
+                unique_violation_tracks=len(totals.violation_track_ids)
+            ) if tracking is not None else None,
+            "pipeline": {
+                "seeks": reader.seeks,
+                "frames_skipped_without_retrieve": reader.grabs_skipped,
+                "stages": {
+                    "decode": reader.stats.as_dict(),
+                    "inference": inference_stats.as_dict(),
+                    "encode": encode_stats.as_dict() if output_path else None
+                },
+                "queues": {
+                    "decoded_frames": reader.queue_stats.as_dict(),
+                    "annotated_frames": writer.queue_stats.as_dict() if writer is not None else None
+                }
+            }
+        })
+
+        logger.info(f"Processed {processed_frames}/{frame_count} frames with {totals.total_violations} violations")
+        return video_metrics
+
+    def process_video(self, video_path: str, output_path: Optional[str] = None, columnar: bool = False,
+                      **options) -> Tuple[Union[List[Dict], ViolationBatch], Dict]:
+        """Run iter_video_detections to the end and collect every violation.
+
+        Takes the same options as iter_video_detections (apart from
+        ``restored``); on a resume the violations found before the checkpoint
+        come first, so the result matches an uninterrupted run. With
+        ``columnar`` the violations come back as a ViolationBatch, which keeps
+        long runs to tens of bytes per violation.
+        """
+        violations = []
+        batch = ViolationBatch() if columnar else None
+        stream = self.iter_video_detections(video_path, output_path, restored=violations, **options)
+        while True:
+            try:
+                frame = next(stream)
+            except StopIteration as done:
+                video_metrics = done.value
+                break
+            violations.extend(frame.violations)
+            if batch is not None:
+                batch.append(violations)
+                violations.clear()
+        if batch is not None:
+            batch.append(violations)  # Restored by a resume that had nothing left to process
+            return batch, video_metrics
         return violations, video_metrics
 
 # Singleton implementation remains the same
 _detector_instance = None
+_detector_lock = threading.Lock()
 
 def get_detector() -> PPEDetector:
     global _detector_instance
     if _detector_instance is None:
-        _detector_instance = PPEDetector()
+        with _detector_lock:  # Streamlit sessions run on separate threads
+            if _detector_instance is None:
+                _detector_instance = PPEDetector()
     return _detector_instance
 
-def detect_ppe(image: np.ndarray, confidence: Optional[float] = None) -> Tuple[np.ndarray, List[Dict], Dict]:
-    return get_detector().detect(image, confidence)
+_batcher_instance = None
+
+def get_micro_batcher() -> Optional[MicroBatcher]:
+    """Shared cross-request batcher when ``micro_batching.enabled`` is set, else None."""
+    global _batcher_instance
+    batching = load_config().get("micro_batching", {})
+    if not batching.get("enabled", False):
+        return None
+    if _batcher_instance is None:
+        pool = get_detector_pool()
+        if pool is not None:
+            submit_batch = lambda images, kwargs: pool.submit_detect_batch(images, **kwargs)
+        else:
+            submit_batch = run_inline(get_detector().detect_batch)
+        with _detector_lock:
+            if _batcher_instance is None:
+                _batcher_instance = MicroBatcher(
+                    submit_batch,
+                    max_batch_size=batching.get("max_batch_size", 8),
+                    max_wait_ms=batching.get("max_wait_ms", 10.0)
+                )
+    return _batcher_instance
+
+def detect_ppe(image: np.ndarray, confidence: Optional[float] = None, profile: Optional[str] = None,
+               camera_id: Optional[str] = None, annotate: Union[bool, str] = True,
+               use_cache: bool = True) -> Tuple[Any, List[Dict], Dict]:
+    batcher = get_micro_batcher()
+    if batcher is not None:
+        return batcher.detect(image, confidence=confidence, profile=profile, camera_id=camera_id, annotate=annotate,
+                              use_cache=use_cache)
+    pool = get_detector_pool()
+    if pool is not None:
+        return pool.submit_detect(image, confidence=confidence, profile=profile, camera_id=camera_id,
+                                  annotate=annotate, use_cache=use_cache).result()
+    return get_detector().detect(image, confidence, profile=profile, camera_id=camera_id, annotate=annotate,
+                                 use_cache=use_cache)
+
+def detect_ppe_batch(images: List[np.ndarray], confidence: Optional[float] = None, profile: Optional[str] = None,
+                     camera_id: Optional[str] = None) -> List[Tuple[np.ndarray, List[Dict], Dict]]:
+    batcher = get_micro_batcher()
+    if batcher is not None:
+        # Each image joins the shared batches, so uploads coalesce with concurrent callers too
+        futures = [batcher.submit(image, confidence=confidence, profile=profile, camera_id=camera_id)
+                   for image in images]
+        return [future.result() for future in futures]
+    pool = get_detector_pool()
+    if pool is not None:
+        return pool.submit_detect_batch(images, confidence=confidence, profile=profile,
+                                        camera_id=camera_id).result()
+    return get_detector().detect_batch(images, confidence, profile=profile, camera_id=camera_id)
+
+def process_video(video_path: str, output_path: Optional[str] = None, parallel: Optional[bool] = None,
+                  **options) -> Tuple[Union[List[Dict], ViolationBatch], Dict]:
+    """Process a video file; ``options`` are passed through to PPEDetector.process_video.
+
+    With ``parallel`` (default: ``parallel_video.enabled``) long videos are
+    split into segments that run concurrently in detector worker processes.
+    """
+    from parallel_video import process_video_parallel, split_plan
+    parallel_config = load_config().get("parallel_video", {})
+    pool = get_detector_pool()
+    if parallel if parallel is not None else parallel_config.get("enabled", False):
+        workers = pool.workers if pool is not None else max(1, (os.cpu_count() or 1) // 2)
+        segments = split_plan(video_path, options, workers)
+        if segments is not None and len(segments) > 1:
+            return process_video_parallel(video_path, output_path, segments, pool=pool, **options)
+    if pool is not None:
+        return pool.submit_process_video(video_path, output_path, **options).result()
+    return get_detector().process_video(video_path, output_path, **options)
+
+def iter_video_detections(video_path: str, output_path: Optional[str] = None,
+                          **options) -> Iterator[FrameDetections]:
+    """Stream a video's detections frame by frame; see PPEDetector.iter_video_detections.
 
-def process_video(video_path: str, output_path: Optional[str] = None) -> Tuple[List[Dict], Dict]:
-    return get_detector().process_video(video_path, output_path)
+    Always runs in this process, since frames are handed back as they are found.
+    """
+    return get_detector().iter_video_detections(video_path, output_path, **options)
 
-__all__ = ["detect_ppe", "process_video", "PPEDetector"]
\ No newline at end of file
+__all__ = ["detect_ppe", "detect_ppe_batch", "iter_video_detections", "process_video", "PPEDetector",
+           "AnnotatedFrame", "FrameDetections"]
\ No newline at end of file
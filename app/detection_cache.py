@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
+from inference_backends import RawDetections
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_MEMORY_HITS = REGISTRY.counter("detection_cache_memory_hits_total", "Detections answered from the memory tier")
+_DISK_HITS = REGISTRY.counter("detection_cache_disk_hits_total", "Detections answered from the disk tier")
+_MISSES = REGISTRY.counter("detection_cache_misses_total", "Cache lookups that went to the model")
+
+
+def cache_key(image: np.ndarray, model_version: str, settings: Dict, conf_threshold: float) -> str:
+    """Content hash of the decoded pixels plus everything that changes the model's answer."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{image.shape}|{image.dtype}|{model_version}|{conf_threshold}|".encode())
+    digest.update(repr(sorted(settings.items())).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """Post-NMS detections keyed by content hash, in an LRU memory tier and an optional disk tier.
+
+    Only raw boxes are stored; violations, metrics and annotations are rebuilt
+    from them on a hit, which takes milliseconds and keeps entries small. The
+    disk tier evicts least recently used files once it exceeds ``disk_max_bytes``.
+    Hits and misses are counted per cache in stats() and process-wide in the
+    ``detection_cache_*_total`` counters.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None, disk_max_bytes: int = 256 << 20):
+        self.max_entries = max(1, max_entries)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, RawDetections]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(path.stat().st_size for path in self.disk_dir.glob("*.npz"))
+
+    def _remember(self, key: str, raw: RawDetections):
+        self._entries[key] = raw
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[RawDetections]:
+        with self._lock:
+            raw = self._entries.get(key)
+            if raw is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                _MEMORY_HITS.inc()
+                return raw
+        raw = self._read_disk(key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                _MISSES.inc()
+                return None
+            self.disk_hits += 1
+            _DISK_HITS.inc()
+            self._remember(key, raw)
+        return raw
+
+    def put(self, key: str, raw: RawDetections):
+        with self._lock:
+            self._remember(key, raw)
+        self._write_disk(key, raw)
+
+    def _read_disk(self, key: str) -> Optional[RawDetections]:
+        if self.disk_dir is None:
+            return None
+        path = self.disk_dir / f"{key}.npz"
+        try:
+            with np.load(path) as data:
+                raw = RawDetections(data["xyxy"], data["conf"], data["cls"])
+            os.utime(path)  # Mark as recently used for eviction
+            return raw
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, raw: RawDetections):
+        if self.disk_dir is None:
+            return
+        path = self.disk_dir / f"{key}.npz"
+        partial = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(partial, "wb") as f:
+                np.savez(f, xyxy=raw.xyxy, conf=raw.conf, cls=raw.cls)
+            os.replace(partial, path)  # Atomic, so readers in other workers never see half a file
+            with self._lock:
+                self._disk_bytes += path.stat().st_size
+                over_budget = self._disk_bytes > self.disk_max_bytes
+            if over_budget:
+                self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {path}: {e}")
+            partial.unlink(missing_ok=True)
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the tier is back to 80% of its budget."""
+        files = []
+        for path in self.disk_dir.glob("*.npz"):
+            try:
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue  # Evicted by another worker
+        total = sum(size for _, size, _ in files)
+        target = int(self.disk_max_bytes * 0.8)
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "disk_bytes": self._disk_bytes if self.disk_dir is not None else None
+            }
+
+
+def cache_from_config(config: Dict) -> Optional[DetectionCache]:
+    """The cache described by the ``cache`` config section, or None when disabled."""
+    cache_config = config.get("cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+    return DetectionCache(
+        max_entries=cache_config.get("max_entries", 256),
+        disk_dir=cache_config.get("disk_dir"),
+        disk_max_bytes=int(cache_config.get("disk_max_mb", 256) * (1 << 20))
+    )
+
+
+__all__ = ["DetectionCache", "cache_from_config", "cache_key"]
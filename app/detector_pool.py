@@ -0,0 +1,157 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from config import load_config
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by _init_worker
+_worker_detector = None
+
+
+def pin_threads(config: Dict, threads: int):
+    """Limit this process's inference to ``threads`` CPU threads for the configured backend."""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    config.setdefault("inference", {})["intra_op_threads"] = threads
+    if config["inference"].get("backend", "torch") == "torch":
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass  # The model loader reports a missing torch install
+
+
+def _init_worker(threads: int):
+    """Load the model once per worker, pinned to its share of the CPU cores."""
+    global _worker_detector
+    config = load_config()
+    pin_threads(config, threads)
+
+    from detection import PPEDetector
+    _worker_detector = PPEDetector(config)
+    logger.info(f"Detector worker {os.getpid()} ready with {threads} threads")
+
+
+def _detect_in_worker(image: np.ndarray, kwargs: Dict) -> Tuple[Any, List[Dict], Dict]:
+    return _worker_detector.detect(image, **kwargs)
+
+
+def _detect_batch_in_worker(images: List[np.ndarray], kwargs: Dict) -> List[Tuple[Any, List[Dict], Dict]]:
+    return _worker_detector.detect_batch(images, **kwargs)
+
+
+def _process_video_in_worker(video_path: str, output_path: Optional[str], kwargs: Dict) -> Tuple[List[Dict], Dict]:
+    return _worker_detector.process_video(video_path, output_path, **kwargs)
+
+
+class DetectorPool:
+    """Spreads detection requests over worker processes that each hold one PPEDetector.
+
+    Requests go through the executor's queue and come back as futures. If a
+    worker dies (OOM, segfault in a native library), the pool is rebuilt and
+    the request is retried up to ``max_retries`` times.
+    """
+
+    def __init__(self, workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 max_retries: int = 1):
+        cpu_count = os.cpu_count() or 1
+        self.workers = max(1, workers or max(1, cpu_count // 2))
+        self.threads_per_worker = max(1, threads_per_worker or cpu_count // self.workers)
+        self.max_retries = max_retries
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),  # torch is not fork-safe
+                    initializer=_init_worker,
+                    initargs=(self.threads_per_worker,)
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not broken:
+                return  # Another request already replaced it
+            logger.warning("Detector worker crashed, restarting the pool")
+            self.restarts += 1
+            self._executor = None
+        broken.shutdown(wait=False)
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        result = Future()
+
+        def attempt(retries_left: int):
+            executor = self._get_executor()
+            try:
+                inner = executor.submit(fn, *args)
+            except BrokenProcessPool as e:
+                inner = Future()
+                inner.set_exception(e)
+
+            def on_done(done: Future):
+                if done.cancelled():
+                    result.cancel()
+                    return
+                error = done.exception()
+                if isinstance(error, BrokenProcessPool):
+                    self._restart(executor)
+                    if retries_left > 0:
+                        attempt(retries_left - 1)
+                        return
+                if error is not None:
+                    result.set_exception(error)
+                else:
+                    result.set_result(done.result())
+
+            inner.add_done_callback(on_done)
+
+        attempt(self.max_retries)
+        return result
+
+    def submit_detect(self, image: np.ndarray, **kwargs) -> Future:
+        return self._submit(_detect_in_worker, image, kwargs)
+
+    def submit_detect_batch(self, images: List[np.ndarray], **kwargs) -> Future:
+        return self._submit(_detect_batch_in_worker, images, kwargs)
+
+    def submit_process_video(self, video_path: str, output_path: Optional[str] = None, **kwargs) -> Future:
+        return self._submit(_process_video_in_worker, str(video_path), output_path, kwargs)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_pool_instance = None
+_pool_lock = threading.Lock()
+
+
+def get_detector_pool() -> Optional[DetectorPool]:
+    """The shared pool when ``pool.enabled`` is set in config, else None."""
+    global _pool_instance
+    pool_config = load_config().get("pool", {})
+    if not pool_config.get("enabled", False):
+        return None
+    with _pool_lock:
+        if _pool_instance is None:
+            _pool_instance = DetectorPool(
+                workers=pool_config.get("workers") or None,
+                threads_per_worker=pool_config.get("threads_per_worker") or None,
+                max_retries=pool_config.get("max_retries", 1)
+            )
+        return _pool_instance
+
+
+__all__ = ["DetectorPool", "get_detector_pool", "pin_threads"]
@@ -4,9 +4,9 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 import logging
-import pandas as pd
 from io import StringIO
 from utils import load_env, get_email_config
+from metrics import timed
 
 logger = logging.getLogger(__name__)
 load_env()
@@ -29,36 +29,46 @@ class EmailService:
     ) -> bool:
         """Send email with optional attachments."""
         try:
-            # Create message container
-            msg = MIMEMultipart()
-            msg['From'] = self.sender_email
-            msg['To'] = ", ".join(recipients)
-            msg['Subject'] = subject
-            
-            # Attach body
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Attach files if provided
-            if attachments:
-                for attachment in attachments:
-                    part = MIMEApplication(
-                        attachment['data'],
-                        Name=attachment['filename']
-                    )
-                    part['Content-Disposition'] = f'attachment; filename="{attachment["filename"]}"'
-                    msg.attach(part)
-            
-            # Connect to SMTP server and send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, recipients, msg.as_string())
-            
+            self._send(subject, body, recipients, attachments)
             logger.info(f"Email sent to {recipients}")
             return True
         except Exception as e:
             logger.error(f"Error sending email: {e}")
             return False
+
+    @timed("email_send_seconds", "SMTP connect, login and send")
+    def _send(
+        self,
+        subject: str,
+        body: str,
+        recipients: List[str],
+        attachments: Optional[List[Dict]] = None
+    ):
+        """Build and send the message; raises on failure so email_send_errors_total counts it."""
+        # Create message container
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['To'] = ", ".join(recipients)
+        msg['Subject'] = subject
+        
+        # Attach body
+        msg.attach(MIMEText(body, 'plain'))
+        
+        # Attach files if provided
+        if attachments:
+            for attachment in attachments:
+                part = MIMEApplication(
+                    attachment['data'],
+                    Name=attachment['filename']
+                )
+                part['Content-Disposition'] = f'attachment; filename="{attachment["filename"]}"'
+                msg.attach(part)
+        
+        # Connect to SMTP server and send email
+        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            server.starttls()
+            server.login(self.sender_email, self.sender_password)
+            server.sendmail(self.sender_email, recipients, msg.as_string())
     
     def send_violation_report(
         self,
@@ -66,6 +76,7 @@ class EmailService:
         time_range: str = "24 hours"
     ) -> bool:
         """Send a formatted violation report email."""
+        import pandas as pd
         try:
             # Create CSV attachment
             df = pd.DataFrame(violations)
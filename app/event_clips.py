@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from video_pipeline import detected_violations
+
+logger = logging.getLogger(__name__)
+
+
+class ClipRecorder:
+    """Writes short clips around violation events instead of the whole annotated video.
+
+    The last ``pre_roll_seconds`` of frames wait in a ring buffer and are
+    only rendered and encoded if a violation follows. A clip stays open
+    until ``post_roll_seconds`` pass without a violation. Frames outside
+    every clip are never drawn or encoded. Only violations with a box start
+    or extend a clip; the ``missing_*`` entries reported for every frame
+    without any visible PPE (an empty bay, say) do not.
+
+    ``open_writer(path)`` and ``close_writer(writer)`` create and finish the
+    per-clip encoders, so the caller decides codec and threading; frames are
+    passed to ``writer.write(frame, timestamp)``.
+    """
+
+    def __init__(self, output_path: str, open_writer: Callable[[str], Any], close_writer: Callable[[Any], None],
+                 fps: float, pre_roll_seconds: float = 2.0, post_roll_seconds: float = 2.0,
+                 clips: Optional[List[Dict]] = None):
+        path = Path(output_path)
+        self.directory = path.parent
+        self.stem = path.stem
+        self.suffix = path.suffix or ".mp4"
+        self.index_path = self.directory / f"{self.stem}.clips.json"
+        self.open_writer = open_writer
+        self.close_writer = close_writer
+        self.post_roll_seconds = post_roll_seconds
+        self.buffer = deque(maxlen=max(0, int(round(pre_roll_seconds * fps))))
+        self.clips: List[Dict] = clips if clips is not None else []  # Carried over on resume
+        self.frames_seen = 0
+        self.frames_written = 0
+        self._writer = None
+        self._current: Optional[Dict] = None
+        self._active_until = float("-inf")
+
+    def _open_clip(self):
+        name = f"{self.stem}_clip{len(self.clips) + 1:03d}{self.suffix}"
+        self._writer = self.open_writer(str(self.directory / name))
+        self._current = {"clip": name, "start_time": None, "end_time": None, "start_frame": None,
+                         "end_frame": None, "violations": 0, "violation_types": []}
+        self.clips.append(self._current)
+
+    def _write(self, frame_number: int, timestamp: float, annotated):
+        if self._current["start_frame"] is None:
+            self._current["start_frame"], self._current["start_time"] = frame_number, timestamp
+        self._current["end_frame"], self._current["end_time"] = frame_number, timestamp
+        self._writer.write(annotated, timestamp)
+        self.frames_written += 1
+
+    def add(self, frame_number: int, timestamp: float, annotated, violations: List[Dict]):
+        """Route one processed frame to the open clip or the pre-roll buffer."""
+        self.frames_seen += 1
+        violations = detected_violations(violations)
+        if violations:
+            self._active_until = timestamp + self.post_roll_seconds
+        if timestamp > self._active_until:
+            self.close_clip()
+            self.buffer.append((frame_number, timestamp, annotated))
+            return
+        if self._writer is None:
+            self._open_clip()
+            while self.buffer:
+                self._write(*self.buffer.popleft())
+        self._write(frame_number, timestamp, annotated)
+        if violations:
+            self._current["violations"] += len(violations)
+            types = self._current["violation_types"]
+            types.extend(sorted({v["violation_type"] for v in violations} - set(types)))
+
+    def close_clip(self):
+        """Finish the open clip; a later frame still inside the post-roll starts a new one."""
+        if self._writer is not None:
+            self.close_writer(self._writer)
+            self._writer = None
+            self._current = None
+
+    def write_index(self):
+        partial = self.index_path.with_suffix(".tmp")
+        with open(partial, "w") as f:
+            json.dump({"clips": self.clips}, f, indent=2)
+        os.replace(partial, self.index_path)
+
+    def summary(self) -> Dict:
+        return {
+            "count": len(self.clips),
+            "index_path": str(self.index_path),
+            "frames_written": self.frames_written,
+            "frames_skipped": self.frames_seen - self.frames_written
+        }
+
+
+__all__ = ["ClipRecorder"]
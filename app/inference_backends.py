@@ -0,0 +1,238 @@
+import ast
+import logging
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class RawDetections(NamedTuple):
+    """Boxes for one frame after NMS, in the coordinates of the frame passed in."""
+    xyxy: np.ndarray  # (N, 4) float
+    conf: np.ndarray  # (N,) float
+    cls: np.ndarray  # (N,) int
+
+
+def _to_numpy(values) -> np.ndarray:
+    """Torch tensors (possibly on GPU) and array-likes to a NumPy array."""
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+class InferenceBackend:
+    """Runs the PPE model on a list of frames and returns one RawDetections per frame.
+
+    Frames are taken exactly as ultralytics' predictor takes NumPy input, so
+    every backend sees the same pixels for the same call.
+    """
+
+    name = "base"
+
+    def __init__(self, model_path: Optional[Path], names: Dict[int, str]):
+        self.model_path = model_path
+        self.names = names
+
+    @property
+    def version(self) -> str:
+        """Identifies the loaded weights, e.g. for cache keys and benchmark reports."""
+        if self.model_path is None or not Path(self.model_path).exists():
+            return f"{self.name}:unknown"
+        stat = Path(self.model_path).stat()
+        return f"{self.name}:{Path(self.model_path).name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    def predict(self, images: List[np.ndarray], conf: float, iou: float, imgsz: int,
+                augment: bool = False, max_det: int = 300) -> List[RawDetections]:
+        raise NotImplementedError
+
+    def warmup(self, imgsz: int = 640):
+        """Run a dummy detection to initialize the model."""
+        self.predict([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], conf=0.25, iou=0.45, imgsz=imgsz)
+
+
+class UltralyticsBackend(InferenceBackend):
+    """Eager PyTorch inference through ultralytics.YOLO."""
+
+    name = "torch"
+
+    def __init__(self, model, model_path: Optional[Path] = None):
+        super().__init__(model_path, dict(model.names))
+        self.model = model
+
+    def predict(self, images: List[np.ndarray], conf: float, iou: float, imgsz: int,
+                augment: bool = False, max_det: int = 300) -> List[RawDetections]:
+        results = self.model.predict(
+            images,
+            conf=conf,
+            iou=iou,
+            imgsz=imgsz,
+            augment=augment,
+            max_det=max_det,
+            verbose=False
+        )
+        return [
+            RawDetections(
+                _to_numpy(res.boxes.xyxy).reshape(-1, 4),
+                _to_numpy(res.boxes.conf).reshape(-1),
+                _to_numpy(res.boxes.cls).astype(np.int64).reshape(-1)
+            )
+            for res in results
+        ]
+
+
+def letterbox(image: np.ndarray, size: Tuple[int, int], color: int = 114) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """Resize keeping aspect ratio and pad to ``size`` (h, w), like ultralytics' LetterBox.
+
+    Returns the padded image, the scale gain and the (left, top) padding.
+    """
+    import cv2
+    h, w = image.shape[:2]
+    gain = min(size[0] / h, size[1] / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_w, pad_h = (size[1] - new_w) / 2, (size[0] - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color, color, color))
+    return image, gain, (left, top)
+
+
+def scale_boxes(boxes: np.ndarray, gain: float, pad: Tuple[float, float], shape: Tuple[int, int]) -> np.ndarray:
+    """Undo a letterbox: map xyxy boxes from the padded input back onto a frame of ``shape`` (h, w)."""
+    boxes = boxes.astype(np.float32, copy=True)
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / gain).clip(0, shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / gain).clip(0, shape[0])
+    return boxes
+
+
+def input_tensor(images: List[np.ndarray], size: Tuple[int, int],
+                 dtype: type = np.float32) -> Tuple[np.ndarray, List[float], List[Tuple[float, float]]]:
+    """NCHW model input for BGR frames, with each frame's letterbox gain and padding.
+
+    Shared with models/quantize.py so INT8 calibration sees the tensors served.
+    """
+    batch, gains, pads = [], [], []
+    for image in images:
+        if image.ndim == 2:
+            image = np.stack([image] * 3, axis=-1)
+        padded, gain, pad = letterbox(image, size)
+        batch.append(padded[..., ::-1])  # BGR to RGB, as ultralytics does for NumPy input
+        gains.append(gain)
+        pads.append(pad)
+    tensor = np.ascontiguousarray(np.stack(batch).transpose(0, 3, 1, 2)).astype(dtype) / 255.0
+    return tensor, gains, pads
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices sorted by score."""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = inter_w * inter_h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """CPU inference of an ultralytics ONNX export with onnxruntime.
+
+    Does its own letterbox preprocessing and class-aware NMS, so neither torch
+    nor ultralytics is imported on this path.
+    """
+
+    name = "onnx"
+    _MAX_WH = 7680  # Per-class box offset for batched class-aware NMS
+    _MAX_NMS = 30000  # Candidate cap before NMS
+
+    def __init__(self, model_path: Path, intra_op_threads: int = 0, inter_op_threads: int = 1,
+                 names: Optional[Dict[int, str]] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 lets onnxruntime use all physical cores
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if "float16" in model_input.type else np.float32
+        batch, _, height, width = model_input.shape
+        self.fixed_batch = batch if isinstance(batch, int) else None
+        self.fixed_size = (height, width) if isinstance(height, int) and isinstance(width, int) else None
+        super().__init__(Path(model_path), names or self._read_names())
+        self._augment_warned = False
+
+    def _read_names(self) -> Dict[int, str]:
+        """Class names from the metadata ultralytics embeds in its ONNX exports."""
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" not in metadata:
+            raise ValueError("ONNX model has no 'names' metadata; pass class names explicitly")
+        return {int(k): v for k, v in ast.literal_eval(metadata["names"]).items()}
+
+    def _preprocess(self, images: List[np.ndarray], size: Tuple[int, int]):
+        return input_tensor(images, size, self.input_dtype)
+
+    def _postprocess(self, output: np.ndarray, conf: float, iou: float, max_det: int,
+                     gain: float, pad: Tuple[float, float], shape: Tuple[int, int]) -> RawDetections:
+        predictions = output.T.astype(np.float32)  # (anchors, 4 + classes)
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        candidates = scores > conf
+        predictions, class_ids, scores = predictions[candidates], class_ids[candidates], scores[candidates]
+        if len(scores) > self._MAX_NMS:
+            top = scores.argsort()[::-1][:self._MAX_NMS]
+            predictions, class_ids, scores = predictions[top], class_ids[top], scores[top]
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        keep = nms(boxes + class_ids[:, None] * self._MAX_WH, scores, iou)[:max_det]
+        boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+        # Undo the letterbox so boxes line up with the frame that was passed in
+        return RawDetections(scale_boxes(boxes, gain, pad, shape), scores, class_ids.astype(np.int64))
+
+    def predict(self, images: List[np.ndarray], conf: float, iou: float, imgsz: int,
+                augment: bool = False, max_det: int = 300) -> List[RawDetections]:
+        if augment and not self._augment_warned:
+            logger.warning("Test-time augmentation is not available with the ONNX backend; ignoring it")
+            self._augment_warned = True
+        size = self.fixed_size or (imgsz, imgsz)
+        step = self.fixed_batch or len(images)
+        detections = []
+        for start in range(0, len(images), max(1, step)):
+            chunk = images[start:start + step]
+            tensor, gains, pads = self._preprocess(chunk, size)
+            outputs = self.session.run(None, {self.input_name: tensor})[0]
+            for image, output, gain, pad in zip(chunk, outputs, gains, pads):
+                detections.append(self._postprocess(output, conf, iou, max_det, gain, pad, image.shape[:2]))
+        return detections
+
+
+def create_backend(config: Dict, model_path: Path, names: Optional[Dict[int, str]] = None) -> InferenceBackend:
+    """Build the backend selected by ``config["inference"]["backend"]`` for the given weights."""
+    inference = config.get("inference", {})
+    backend = inference.get("backend", "torch")
+    if backend == "onnx":
+        return OnnxRuntimeBackend(
+            model_path,
+            intra_op_threads=inference.get("intra_op_threads", 0),
+            inter_op_threads=inference.get("inter_op_threads", 1),
+            names=names
+        )
+    if backend == "torch":
+        from ultralytics import YOLO
+        return UltralyticsBackend(YOLO(str(model_path)), model_path)
+    raise ValueError(f"Unknown inference backend '{backend}'. Use 'torch' or 'onnx'.")
@@ -1,6 +1,7 @@
 
 from .auth import authenticate_user
-from .detection import detect_ppe, process_video
+from .detection import detect_ppe, detect_ppe_batch, iter_video_detections, process_video
+from .stream_processor import StreamProcessor
 from .database import DatabaseHandler
 from .chatbot import ComplianceChatbot
 from .email_service import EmailService
@@ -9,7 +10,10 @@ from .utils import load_config, setup_logging
 __all__ = [
     'authenticate_user',
     'detect_ppe',
+    'detect_ppe_batch',
+    'iter_video_detections',
     'process_video',
+    'StreamProcessor',
     'DatabaseHandler',
     'ComplianceChatbot',
     'EmailService',
@@ -1,22 +1,15 @@
 import os
-import cv2
-import time
 import base64
-import numpy as np
-import pandas as pd
-import psycopg2
-from PIL import Image
-from pathlib import Path
 from datetime import datetime
 import streamlit as st
-import plotly.express as px
-from dotenv import load_dotenv
-from detection import detect_ppe, process_video
+from detection import detect_ppe_batch, process_video
 from utils import read_image, save_uploaded_file
 from chatbot import get_chatbot_response
 from email_service import send_violation_email
 from database import ComplianceDB
 from user_management import register_user, authenticate_user
+from config import load_config as load_app_config
+from metrics import REGISTRY, Counter, render_prometheus, start_exporter
 
 # Set page config FIRST, before any other Streamlit commands!
 st.set_page_config(
@@ -393,6 +386,9 @@ def registration_form():
 
 def show_dashboard():
     """Render the dashboard with modern styling"""
+    # Charting/dataframe libraries load on first render, not at startup
+    import pandas as pd
+    import plotly.express as px
     # Dashboard header
     st.markdown("""
     <div class="dashboard-header">
@@ -615,70 +611,55 @@ def show_upload_detect():
             <p style="color: var(--text-light); margin-bottom: 1.5rem;">Supported formats: JPG, JPEG, PNG, MP4, AVI, MOV, MPEG4 (Max 200MB)</p>
         """, unsafe_allow_html=True)
         
-        uploaded_file = st.file_uploader(
-            "Choose a file", 
+        uploaded_files = st.file_uploader(
+            "Choose files", 
             type=['jpg', 'jpeg', 'png', 'mp4', 'avi', 'mov', 'mpeg4'],
+            accept_multiple_files=True,
             label_visibility="collapsed"
         )
         
-        if uploaded_file and st.button("Analyze for PPE Compliance", type="primary"):
+        if uploaded_files and st.button("Analyze for PPE Compliance", type="primary"):
             st.session_state.processing = True
             try:
-                if uploaded_file.type.startswith('image'):
-                    image = read_image(uploaded_file)
-                    with st.spinner("🔍 Analyzing image for PPE compliance..."):
-                        annotated, violations, metrics = detect_ppe(image, confidence=0.7)
-                        st.session_state.detection_results = {
-                            "annotated": annotated,
-                            "violations": violations,
-                            "metrics": metrics,
-                            "is_video": False
-                        }
-                        violation_counts = {}
-                        for v in violations:
-                            vt = v["violation_type"].replace("no_", "")
-                            violation_counts[vt] = violation_counts.get(vt, 0) + 1
-                        st.session_state.violation_counts = violation_counts
-                        st.session_state.violations = [
-                            v["violation_type"].replace("_", " ")
-                            for v in violations
-                        ]
-                        # Log the violation to database
-                        db = ComplianceDB()
-                        db.log_violation({
-                            'violations': violations,
-                            'image_path': f"uploads/{uploaded_file.name}",
-                            'location': 'Unknown',
-                            'camera_id': 'web_upload',
-                            'employee_id': st.session_state.current_user['username']
-                        })
-                        if violations:
-                            email_sent = send_violation_email(violations, time_range="just now")
-                            if email_sent:
-                                st.success("📧 Violation alert email sent to safety heads.")
-                else:
+                image_files = [f for f in uploaded_files if f.type.startswith('image')]
+                video_files = [f for f in uploaded_files if not f.type.startswith('image')]
+                violations = []
+                detection_results = {
+                    "annotated": [],
+                    "processed_paths": [],
+                    "violations": violations,
+                    "metrics": []
+                }
+                db = ComplianceDB()
+
+                if image_files:
+                    images = [read_image(f) for f in image_files]
+                    with st.spinner("🔍 Analyzing images for PPE compliance..."):
+                        # All uploaded images share batched forward passes
+                        batch_results = detect_ppe_batch(images, confidence=0.7)
+                        for uploaded_file, (annotated, image_violations, metrics) in zip(image_files, batch_results):
+                            detection_results["annotated"].append(annotated)
+                            detection_results["metrics"].append(metrics)
+                            violations.extend(image_violations)
+                            # Log the violation to database
+                            db.log_violation({
+                                'violations': image_violations,
+                                'image_path': f"uploads/{uploaded_file.name}",
+                                'location': 'Unknown',
+                                'camera_id': 'web_upload',
+                                'employee_id': st.session_state.current_user['username']
+                            })
+
+                for uploaded_file in video_files:
                     video_path = save_uploaded_file(uploaded_file)
-                    with st.spinner("🎥 Processing video for PPE compliance..."):
+                    with st.spinner(f"🎥 Processing {uploaded_file.name} for PPE compliance..."):
                         output_path = os.path.join("outputs", f"processed_{os.path.basename(video_path)}")
-                        violations, metrics = process_video(video_path, output_path)
-                        st.session_state.detection_results = {
-                            "processed_path": output_path,
-                            "violations": violations,
-                            "metrics": metrics,
-                            "is_video": True
-                        }
-                        violation_counts = {}
-                        for v in violations:
-                            vt = v["violation_type"].replace("no_", "")
-                            violation_counts[vt] = violation_counts.get(vt, 0) + 1
-                        st.session_state.violation_counts = violation_counts
-                        st.session_state.violations = [
-                            v["violation_type"].replace("_", " ")
-                            for v in violations
-                        ]
+                        video_violations, metrics = process_video(video_path, output_path)
+                        detection_results["processed_paths"].append(output_path)
+                        detection_results["metrics"].append(metrics)
+                        violations.extend(video_violations)
                         # Log the violations to database
-                        db = ComplianceDB()
-                        for violation in violations:
+                        for violation in video_violations:
                             db.log_violation({
                                 'violations': [violation],
                                 'image_path': output_path,
@@ -686,10 +667,21 @@ def show_upload_detect():
                                 'camera_id': 'web_upload',
                                 'employee_id': st.session_state.current_user['username']
                             })
-                        if violations:
-                            email_sent = send_violation_email(violations, time_range="just now")
-                            if email_sent:
-                                st.success("📧 Violation alert email sent to safety heads.")
+
+                st.session_state.detection_results = detection_results
+                violation_counts = {}
+                for v in violations:
+                    vt = v["violation_type"].replace("no_", "")
+                    violation_counts[vt] = violation_counts.get(vt, 0) + 1
+                st.session_state.violation_counts = violation_counts
+                st.session_state.violations = [
+                    v["violation_type"].replace("_", " ")
+                    for v in violations
+                ]
+                if violations:
+                    email_sent = send_violation_email(violations, time_range="just now")
+                    if email_sent:
+                        st.success("📧 Violation alert email sent to safety heads.")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
             finally:
@@ -710,10 +702,10 @@ def show_upload_detect():
                 <div class="card">
                 """, unsafe_allow_html=True)
                 
-                if result.get("is_video"):
-                    st.video(result["processed_path"])
-                else:
+                if result.get("annotated"):
                     st.image(result["annotated"], use_column_width=True)
+                for processed_path in result.get("processed_paths", []):
+                    st.video(processed_path)
                 
                 st.markdown("""
                 <h3 style="color: var(--text); margin-top: 1.5rem;">Analysis Summary</h3>
@@ -831,6 +823,7 @@ def show_chatbot():
 
 def show_logs_reports():
     """Render the logs and reports page with modern styling"""
+    import pandas as pd
     st.markdown("""
     <div class="dashboard-header">
         <div>
@@ -900,6 +893,84 @@ def show_logs_reports():
         
         st.markdown("</div>", unsafe_allow_html=True)
 
+def show_diagnostics():
+    """Render per-stage latency histograms so slow requests can be traced to a stage, then batch sizes"""
+    import pandas as pd
+    st.markdown("""
+    <div class="dashboard-header">
+        <div>
+            <h1 class="dashboard-title">Diagnostics</h1>
+            <p class="dashboard-subtitle">Where time goes on the request path, since this process started</p>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    metrics = sorted(REGISTRY.all(), key=lambda m: m.name)
+    counters = [m for m in metrics if isinstance(m, Counter)]
+    latencies = [m for m in metrics if not isinstance(m, Counter) and m.unit == "seconds"]
+    sizes = [m for m in metrics if not isinstance(m, Counter) and m.unit != "seconds"]
+
+    def bound(histogram, q, scale=1):
+        upper = histogram.quantile(q)
+        if upper is None:
+            return None
+        if upper == float("inf"):  # Past the last bucket, so only its lower bound is known
+            return f"> {histogram.buckets[-1] * scale:g}"
+        return f"≤ {upper * scale:g}"
+
+    with st.container():
+        st.markdown("""
+        <div class="card">
+            <h2 class="card-title">Stage Latency</h2>
+        """, unsafe_allow_html=True)
+        rows = []
+        for histogram in latencies:
+            snapshot = histogram.snapshot()
+            rows.append({
+                "Metric": histogram.name,
+                "Description": histogram.description,
+                "Calls": snapshot["count"],
+                "Mean (ms)": round(snapshot["sum"] / snapshot["count"] * 1000, 2) if snapshot["count"] else None,
+                "p50 (ms)": bound(histogram, 0.5, 1000),
+                "p95 (ms)": bound(histogram, 0.95, 1000),
+                "p99 (ms)": bound(histogram, 0.99, 1000),
+                "Total (s)": round(snapshot["sum"], 3)
+            })
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+            st.caption("Percentiles are histogram bucket upper bounds.")
+        else:
+            st.info("No requests measured yet")
+        size_rows = []
+        for histogram in sizes:
+            snapshot = histogram.snapshot()
+            size_rows.append({
+                "Metric": histogram.name,
+                "Description": histogram.description,
+                "Observations": snapshot["count"],
+                "Unit": histogram.unit,
+                "Mean": round(snapshot["sum"] / snapshot["count"], 2) if snapshot["count"] else None,
+                "p50": bound(histogram, 0.5),
+                "p95": bound(histogram, 0.95),
+                "p99": bound(histogram, 0.99)
+            })
+        if size_rows:
+            st.dataframe(pd.DataFrame(size_rows), use_container_width=True, hide_index=True)
+        if counters:
+            st.dataframe(
+                pd.DataFrame([{"Counter": c.name, "Description": c.description, "Value": int(c.value)}
+                              for c in counters]),
+                use_container_width=True,
+                hide_index=True
+            )
+        st.download_button(
+            label="Download Prometheus metrics",
+            data=render_prometheus(),
+            file_name="intelliguard_metrics.prom",
+            mime="text/plain"
+        )
+        st.markdown("</div>", unsafe_allow_html=True)
+
 def main_app():
     """Main application layout with navigation"""
     # Navigation sidebar
@@ -915,7 +986,7 @@ def main_app():
         # Navigation tabs
         selected_tab = st.radio(
             "Navigation",
-            ["Dashboard", "PPE Detection", "Assistant", "Compliance Logs"],
+            ["Dashboard", "PPE Detection", "Assistant", "Compliance Logs", "Diagnostics"],
             label_visibility="collapsed"
         )
         
@@ -941,11 +1012,14 @@ def main_app():
         show_chatbot()
     elif selected_tab == "Compliance Logs":
         show_logs_reports()
+    elif selected_tab == "Diagnostics":
+        show_diagnostics()
 
 def main():
     """Main application function"""
     # Set custom theme
     set_custom_theme()
+    start_exporter(load_app_config())  # No-op after the first rerun
     
     # Initialize session state
     if 'authenticated' not in st.session_state:
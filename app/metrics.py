@@ -0,0 +1,242 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond up to slow RDS/SMTP round trips
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket bounds, Prometheus style.
+
+    ``unit`` says what is observed, "seconds" for latencies or "count" for
+    sizes such as requests per batch, so displays can format values.
+    """
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 unit: str = "seconds"):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.unit = unit
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        """Count, sum and cumulative bucket counts keyed by upper bound."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(list(self.buckets) + [float("inf")], counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (None when empty)."""
+        snapshot = self.snapshot()
+        if not snapshot["count"]:
+            return None
+        rank = q * snapshot["count"]
+        for bound, cumulative in snapshot["buckets"].items():
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    @contextmanager
+    def timer(self):
+        """Observe the wall time of the ``with`` block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Counter:
+    """Thread-safe monotonically increasing count."""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        with self._lock:
+            return self._value
+
+
+class MetricsRegistry:
+    """Process-wide collection of named metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Histogram, Counter]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, kind: type, create: Callable):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = create()
+            metric = self._metrics[name]
+        if not isinstance(metric, kind):
+            raise ValueError(f"Metric '{name}' is already registered as a {type(metric).__name__}")
+        return metric
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  unit: str = "seconds") -> Histogram:
+        """Get or create the histogram called ``name``."""
+        return self._get(name, Histogram, lambda: Histogram(name, description, buckets, unit))
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create the counter called ``name``."""
+        return self._get(name, Counter, lambda: Counter(name, description))
+
+    def all(self) -> List[Union[Histogram, Counter]]:
+        with self._lock:
+            return list(self._metrics.values())
+
+
+def timed(name: str, description: str = "", registry: Optional[MetricsRegistry] = None):
+    """Decorator recording each call's duration in histogram ``name``.
+
+    Calls that raise also count towards ``<name>_errors_total`` (with a
+    trailing ``_seconds`` dropped from the name).
+    """
+    registry = registry or REGISTRY
+    histogram = registry.histogram(name, description)
+    errors = registry.counter(f"{name[:-len('_seconds')] if name.endswith('_seconds') else name}_errors_total",
+                              f"Calls that raised, out of {name}")
+
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in sorted((registry or REGISTRY).all(), key=lambda m: m.name):
+        if metric.description:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+        if isinstance(metric, Counter):
+            lines.append(f"# TYPE {metric.name} counter")
+            lines.append(f"{metric.name} {_format_value(metric.value)}")
+            continue
+        snapshot = metric.snapshot()
+        lines.append(f"# TYPE {metric.name} histogram")
+        for bound, cumulative in snapshot["buckets"].items():
+            lines.append(f'{metric.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{metric.name}_sum {snapshot['sum']!r}")
+        lines.append(f"{metric.name}_count {snapshot['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str, registry: Optional[MetricsRegistry] = None):
+    """Write the exposition atomically, e.g. for node_exporter's textfile collector."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    partial.write_text(render_prometheus(registry))
+    os.replace(partial, path)
+
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None):
+    """Serve ``/metrics`` from a daemon thread; returns the server so callers can shut it down."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(registry).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the application log
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def _write_textfile_forever(path: str, interval: float):
+    while True:
+        try:
+            write_textfile(path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
+        time.sleep(interval)
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def start_exporter(config: Dict):
+    """Start the endpoint and/or textfile writer from the ``metrics`` config section, once per process."""
+    global _exporter_started
+    metrics_config = config.get("metrics", {})
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+        if metrics_config.get("endpoint_enabled", False):
+            try:
+                start_http_server(metrics_config.get("port", 9108), metrics_config.get("host", "127.0.0.1"))
+            except OSError as e:
+                logger.warning(f"Metrics endpoint not started: {e}")
+        if metrics_config.get("textfile"):
+            threading.Thread(target=_write_textfile_forever, name="metrics-textfile", daemon=True,
+                             args=(metrics_config["textfile"], metrics_config.get("textfile_interval_seconds", 15.0))
+                             ).start()
+
+
+REGISTRY = MetricsRegistry()
+
+__all__ = ["Counter", "Histogram", "MetricsRegistry", "REGISTRY", "render_prometheus", "start_exporter",
+           "start_http_server", "timed", "write_textfile"]
@@ -0,0 +1,110 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+# Submits (images, detect_batch kwargs) and returns a future of per-image results
+BatchSubmitter = Callable[[List[np.ndarray], Dict], Future]
+
+
+class _Request(NamedTuple):
+    image: np.ndarray
+    options: Tuple  # (confidence, profile, camera_id, annotate, use_cache); only equal options share a batch
+    enqueued: float
+    future: Future
+
+
+def run_inline(detect_batch: Callable) -> BatchSubmitter:
+    """Submitter that runs detect_batch on the batcher thread itself."""
+    def submit(images: List[np.ndarray], kwargs: Dict) -> Future:
+        future = Future()
+        try:
+            future.set_result(detect_batch(images, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return submit
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-image requests into batched forward passes.
+
+    A batch closes when it holds ``max_batch_size`` requests or when the
+    oldest request has waited ``max_wait_ms``, whichever comes first. Batch
+    sizes and queue waits go to the ``detector_batch_size`` and
+    ``detector_queue_wait_seconds`` histograms.
+    """
+
+    def __init__(self, submit_batch: BatchSubmitter, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.submit_batch = submit_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.batch_sizes = REGISTRY.histogram("detector_batch_size", "Requests per micro-batch", BATCH_SIZE_BUCKETS,
+                                              unit="count")
+        self.queue_waits = REGISTRY.histogram("detector_queue_wait_seconds", "Time a request waited to be batched")
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image: np.ndarray, confidence: Optional[float] = None, profile: Optional[str] = None,
+               camera_id: Optional[str] = None, annotate: Union[bool, str] = True, use_cache: bool = True) -> Future:
+        future = Future()
+        self._queue.put(_Request(image, (confidence, profile, camera_id, annotate, use_cache), time.perf_counter(),
+                                 future))
+        return future
+
+    def detect(self, image: np.ndarray, **kwargs) -> Tuple[Any, List[Dict], Dict]:
+        return self.submit(image, **kwargs).result()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            groups: Dict[Tuple, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(request.options, []).append(request)
+                self.queue_waits.observe(dispatched - request.enqueued)
+
+            for (confidence, profile, camera_id, annotate, use_cache), requests in groups.items():
+                self.batch_sizes.observe(len(requests))
+                kwargs = {"confidence": confidence, "profile": profile, "camera_id": camera_id,
+                          "annotate": annotate, "use_cache": use_cache, "batch_size": len(requests)}
+                try:
+                    pending = self.submit_batch([r.image for r in requests], kwargs)
+                except Exception as e:
+                    pending = Future()
+                    pending.set_exception(e)
+                pending.add_done_callback(lambda done, requests=requests: self._fan_out(done, requests))
+
+    @staticmethod
+    def _fan_out(done: Future, requests: List[_Request]):
+        error = done.exception()
+        if error is not None:
+            logger.error(f"Micro-batch of {len(requests)} failed: {error}")
+            for request in requests:
+                request.future.set_exception(error)
+            return
+        for request, result in zip(requests, done.result()):
+            request.future.set_result(result)
+
+
+__all__ = ["MicroBatcher", "run_inline"]
@@ -0,0 +1,196 @@
+import bisect
+import logging
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from config import load_config
+from detector_pool import DetectorPool, get_detector_pool
+from video_checkpoint import concat_parts, part_path
+from video_pipeline import FrameSampler, StageStats, VideoTotals
+from violation_batch import ViolationBatch
+
+logger = logging.getLogger(__name__)
+
+# (first, last) 1-based frame numbers; last is None for "until the end of the video"
+Segment = Tuple[int, Optional[int]]
+
+
+def keyframe_numbers(video_path: str, fps: float) -> Optional[List[int]]:
+    """1-based frame numbers of the video's keyframes via ffprobe, or None when ffprobe is unavailable."""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=pts_time", "-of", "csv=p=0", str(video_path)],
+            capture_output=True, text=True, check=True, timeout=120
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"ffprobe could not list keyframes of {video_path}: {e}")
+        return None
+    times = [float(line.strip().rstrip(",")) for line in result.stdout.splitlines()
+             if line.strip().rstrip(",") not in ("", "N/A")]
+    return sorted({round(t * fps) + 1 for t in times})
+
+
+def plan_segments(total_frames: int, segments: int, keyframes: Optional[List[int]] = None) -> List[Segment]:
+    """Split frames 1..total_frames into about ``segments`` contiguous ranges.
+
+    Boundaries are moved to the nearest keyframe when keyframes are known, so
+    every worker's opening seek lands on a keyframe instead of decoding
+    forward from the previous one.
+    """
+    starts = []
+    for i in range(1, max(1, segments)):
+        boundary = 1 + round(i * total_frames / segments)
+        if keyframes:
+            index = bisect.bisect_left(keyframes, boundary)
+            nearby = keyframes[max(0, index - 1):index + 1]
+            boundary = min(nearby, key=lambda k: abs(k - boundary))
+        if 1 < boundary <= total_frames and (not starts or boundary > starts[-1]):
+            starts.append(boundary)
+    starts = [1] + starts
+    ends = [start - 1 for start in starts[1:]] + [None]
+    return list(zip(starts, ends))
+
+
+def split_plan(video_path: str, options: Dict, workers: int) -> Optional[List[Segment]]:
+    """Segments for a parallel run, or None when the video should be processed sequentially.
+
+    Tracking, the motion gate, adaptive sampling and event clips carry state
+    from frame to frame, and output segments cannot be checkpointed, so those
+    runs stay sequential.
+    """
+    import cv2
+    config = load_config()
+    parallel_config = config.get("parallel_video", {})
+    detect_interval = options.get("detect_interval") or config.get("tracking", {}).get("detect_interval", 1)
+    motion_gate = options.get("motion_gate")
+    if motion_gate is None:
+        motion_gate = config["detection"].get("motion_gate", {}).get("enabled", False)
+    adaptive = options.get("adaptive")
+    if adaptive is None:
+        adaptive = config.get("sampling", {}).get("adaptive", {}).get("enabled", False)
+    if detect_interval > 1 or motion_gate or adaptive or options.get("checkpoint") or options.get("resume") \
+            or options.get("frame_range") or options.get("output_mode") == "clips":
+        logger.info("Frame-to-frame state or checkpointing requested, processing sequentially")
+        return None
+
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames / fps < parallel_config.get("min_seconds", 120) or workers < 2:
+        return None
+    segments = parallel_config.get("segments") or workers
+    return plan_segments(total_frames, segments, keyframe_numbers(video_path, fps))
+
+
+def _merge_stage(name: str, parts: List[Optional[Dict]]) -> Optional[Dict]:
+    if all(part is None for part in parts):
+        return None
+    total = StageStats(name)
+    for part in parts:
+        if part is not None:
+            total.items += part["items"]
+            total.busy_seconds += part["busy_seconds"]
+            total.wait_seconds += part["wait_seconds"]
+    return total.as_dict()
+
+
+def merge_segment_results(results: List[Tuple[Union[List[Dict], ViolationBatch], Dict]], segments: List[Segment],
+                          fps: float) -> Tuple[Union[List[Dict], ViolationBatch], Dict]:
+    """Stitch per-segment results into what one sequential run would have returned."""
+    metrics = [segment_metrics for _, segment_metrics in results]
+    totals = VideoTotals()
+    if results and isinstance(results[0][0], ViolationBatch):
+        violations = ViolationBatch.concat(segment_violations for segment_violations, _ in results)
+        records = violations.records
+        totals.add_columns(records["confidence"], records["critical"], records["track_id"])
+    else:
+        violations = [violation for segment_violations, _ in results for violation in segment_violations]
+        for violation in violations:
+            totals.add_violation(violation)
+    for name in ("processed_frames", "total_detections", "violation_frames"):
+        setattr(totals, name, sum(m[name] for m in metrics))
+    # The last segment is the one that reads to the end
+    video_metrics = totals.summary(metrics[-1]["total_frames"], fps)
+    pipelines = [m["pipeline"] for m in metrics]
+    video_metrics.update({
+        "profile": metrics[0]["profile"],
+        "motion_gate": None,
+        "adaptive_sampling": None,
+        "clips": None,
+        "checkpoint": None,
+        "tracking": None,
+        "pipeline": {
+            "seeks": sum(p["seeks"] for p in pipelines),
+            "frames_skipped_without_retrieve": sum(p["frames_skipped_without_retrieve"] for p in pipelines),
+            "stages": {
+                stage: _merge_stage(stage, [p["stages"][stage] for p in pipelines])
+                for stage in ("decode", "inference", "encode")
+            },
+            "queues": None  # Per-process queue depths do not add up meaningfully
+        },
+        "parallel": {
+            "segments": [
+                {"frame_range": list(segment), "processed_frames": m["processed_frames"]}
+                for segment, m in zip(segments, metrics)
+            ]
+        }
+    })
+    return violations, video_metrics
+
+
+def process_video_parallel(video_path: str, output_path: Optional[str], segments: List[Segment],
+                           pool: Optional[DetectorPool] = None, **options) -> Tuple[List[Dict], Dict]:
+    """Process ``segments`` of one video concurrently in detector worker processes.
+
+    Each worker seeks to its segment and runs process_video on that frame
+    range; frame numbers, timestamps and metrics are merged to match a
+    sequential run. Output segments are joined into ``output_path``.
+    """
+    import cv2
+    own_pool = None
+    if pool is None:
+        pool = get_detector_pool()
+    if pool is None:
+        pool_config = load_config().get("pool", {})
+        pool = own_pool = DetectorPool(workers=pool_config.get("workers") or None,
+                                       threads_per_worker=pool_config.get("threads_per_worker") or None)
+
+    output_name = Path(output_path).name if output_path else None
+    try:
+        futures = [
+            pool.submit_process_video(video_path, part_path(output_name, index) if output_name else None,
+                                      frame_range=segment, **options)
+            for index, segment in enumerate(segments)
+        ]
+        results = [future.result() for future in futures]
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    if output_name:
+        output_dir = Path(load_config()["paths"]["output_dir"])
+        sampling_config = load_config().get("sampling", {})
+        sampler = FrameSampler.for_video(fps, total_frames, options.get("sample_fps"), options.get("frame_numbers"),
+                                         default_fps=sampling_config.get("default_fps", 3.0),
+                                         full_below_seconds=sampling_config.get("full_below_seconds", 10.0))
+        concat_parts([str(output_dir / part_path(output_name, index)) for index in range(len(segments))],
+                     str(output_dir / output_name), sampler.output_fps, size)
+
+    logger.info(f"Processed {video_path} as {len(segments)} segments on {pool.workers} workers "
+                f"({os.cpu_count()} cores)")
+    return merge_segment_results(results, segments, fps)
+
+
+__all__ = ["merge_segment_results", "plan_segments", "process_video_parallel", "split_plan"]
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Union
+import numpy as np
+from config import load_config
+from detection import detect_ppe
+from metrics import REGISTRY, Histogram
+
+logger = logging.getLogger(__name__)
+
+LIVE_SCHEMES = ("rtsp://", "rtsps://", "http://", "https://", "rtmp://", "udp://", "tcp://")
+
+
+class StreamResult(NamedTuple):
+    """Detections for one processed stream frame."""
+    frame_index: int  # 1-based index among captured frames, so gaps show what was dropped
+    captured_at: float  # Wall-clock capture time (time.time())
+    frame: np.ndarray
+    annotated: Any  # None unless the processor annotates
+    violations: List[Dict]
+    metrics: Dict
+    latency: float  # Seconds from capture to result
+
+
+def _open_source(source: Union[str, int]):
+    import cv2
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)  # "0" -> first V4L2 device
+    return cv2.VideoCapture(source)
+
+
+def _is_live(source: Union[str, int]) -> bool:
+    return isinstance(source, int) or str(source).isdigit() or str(source).startswith(("/dev/video",) + LIVE_SCHEMES)
+
+
+class LatestFrameGrabber(threading.Thread):
+    """Capture thread that keeps only the newest frame (drop-oldest).
+
+    Frames the consumer has not taken by the time the next one arrives are
+    counted as dropped. Live sources are reopened after a read failure; a
+    local file ends the stream, and with ``realtime`` it is paced to its own
+    frame rate so it behaves like a camera.
+    """
+
+    def __init__(self, source: Union[str, int], realtime: Optional[bool] = None, reconnect_delay: float = 2.0,
+                 max_reconnects: int = 5):
+        super().__init__(name="stream-capture", daemon=True)
+        self.source = source
+        self.live = _is_live(source)
+        self.realtime = (not self.live) if realtime is None else realtime
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self._latest = None  # (frame_index, captured_at, captured_perf, frame)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _publish(self, frame: np.ndarray):
+        self.frames_captured += 1
+        with self._condition:
+            if self._latest is not None:
+                self.frames_dropped += 1
+            self._latest = (self.frames_captured, time.time(), time.perf_counter(), frame)
+            self._condition.notify()
+
+    def count_dropped(self, count: int = 1):
+        """Count frames a consumer discarded after taking them, e.g. replaced before they were processed."""
+        with self._condition:
+            self.frames_dropped += count
+
+    def run(self):
+        import cv2
+        cap = _open_source(self.source)
+        failures = 0
+        start = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                ok, frame = cap.read() if cap.isOpened() else (False, None)
+                if not ok:
+                    if not self.live or failures >= self.max_reconnects:
+                        if self.live:
+                            self.error = RuntimeError(f"Stream {self.source} unavailable after {failures} reconnects")
+                        break
+                    failures += 1
+                    self.reconnects += 1
+                    logger.warning(f"Stream {self.source} read failed, reconnecting ({failures}/{self.max_reconnects})")
+                    cap.release()
+                    self._stop_event.wait(self.reconnect_delay)
+                    cap = _open_source(self.source)
+                    continue
+                failures = 0
+                if self.realtime:
+                    # Hold the frame until its presentation time, as a camera would deliver it
+                    due = start + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    self._stop_event.wait(max(0.0, due - time.perf_counter()))
+                self._publish(frame)
+        except Exception as e:
+            logger.error(f"Stream capture failed: {e}")
+            self.error = e
+        finally:
+            cap.release()
+            with self._condition:
+                self.finished = True
+                self._condition.notify_all()
+
+    def latest(self, timeout: Optional[float] = None):
+        """Take the newest frame, waiting for one; None once the stream has ended."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._latest is not None or self.finished or self._stop_event.is_set(), timeout
+            )
+            item, self._latest = self._latest, None
+            return item
+
+
+class StreamProcessor:
+    """Runs PPE detection on a continuous source, always on the newest frame.
+
+    ``source`` is an RTSP/HTTP URL, a V4L2 device (index or /dev/videoN) or a
+    local file, which is played back in real time by default as a stand-in
+    for a camera. Results arrive through ``callback``, by iterating the
+    processor, or with ``async for``. Capture-to-result latency goes to the
+    ``stream_latency_seconds`` histogram.
+    """
+
+    def __init__(self, source: Union[str, int], callback: Optional[Callable[[StreamResult], None]] = None,
+                 camera_id: Optional[str] = None, profile: Optional[str] = None,
+                 confidence: Optional[float] = None, annotate: Union[bool, str] = False,
+                 realtime: Optional[bool] = None, detect_fn: Callable = detect_ppe):
+        detection_config = load_config()["detection"]
+        self.source = source
+        self.callback = callback
+        self.camera_id = camera_id
+        self.profile = (profile
+                        or detection_config.get("camera_profiles", {}).get(camera_id)
+                        or detection_config.get("default_profiles", {}).get("stream"))
+        self.confidence = confidence
+        self.annotate = annotate
+        self.detect_fn = detect_fn
+        self.grabber = LatestFrameGrabber(source, realtime=realtime)
+        self.latency = Histogram("stream_latency_seconds", "Capture to result latency for this stream")
+        self._global_latency = REGISTRY.histogram("stream_latency_seconds", "Capture to result latency of stream frames")
+        self.frames_processed = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StreamProcessor":
+        """Start capturing; with a callback, also start processing on a background thread."""
+        self.grabber.start()
+        if self.callback is not None:
+            self._thread = threading.Thread(target=self._run_callbacks, name="stream-processor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self.grabber.stop()
+        self.grabber.join()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self) -> "StreamProcessor":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _process(self, item) -> Optional[StreamResult]:
+        frame_index, captured_at, captured_perf, frame = item
+        try:
+            annotated, violations, metrics = self.detect_fn(
+                frame, self.confidence, profile=self.profile, camera_id=self.camera_id, annotate=self.annotate,
+                use_cache=False  # Live frames never repeat, so hashing them would be wasted work
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Stream frame {frame_index} processing error: {e}")
+            return None
+        latency = time.perf_counter() - captured_perf
+        self.latency.observe(latency)
+        self._global_latency.observe(latency)
+        self.frames_processed += 1
+        for violation in violations:
+            violation.update({"timestamp": captured_at, "frame": frame_index, "camera_id": self.camera_id})
+        return StreamResult(frame_index, captured_at, frame, annotated, violations, metrics, latency)
+
+    def __iter__(self) -> Iterator[StreamResult]:
+        if self.grabber.ident is None:
+            self.grabber.start()
+        while True:
+            item = self.grabber.latest()
+            if item is None:
+                break  # Stream ended or the processor was stopped
+            result = self._process(item)
+            if result is not None:
+                yield result
+        if self.grabber.error is not None:
+            raise RuntimeError(f"Stream {self.source} failed: {self.grabber.error}")
+
+    async def __aiter__(self) -> AsyncIterator[StreamResult]:
+        loop = asyncio.get_running_loop()
+        iterator = iter(self)
+        done = object()
+        while True:
+            # Detection blocks, so each step runs in the default executor
+            result = await loop.run_in_executor(None, next, iterator, done)
+            if result is done:
+                break
+            yield result
+
+    def _run_callbacks(self):
+        try:
+            for result in self:
+                self.callback(result)
+        except Exception as e:
+            logger.error(f"Stream processing stopped: {e}")
+
+    def stats(self) -> Dict:
+        """Capture, drop and latency figures for this stream so far."""
+        latency = self.latency.snapshot()
+        return {
+            "frames_captured": self.grabber.frames_captured,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.grabber.frames_dropped,
+            "errors": self.errors,
+            "reconnects": self.grabber.reconnects,
+            "latency_avg_seconds": latency["sum"] / latency["count"] if latency["count"] else 0.0,
+            "latency_p50_seconds": self.latency.quantile(0.5),
+            "latency_p95_seconds": self.latency.quantile(0.95)
+        }
+
+
+__all__ = ["LatestFrameGrabber", "StreamProcessor", "StreamResult"]
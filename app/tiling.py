@@ -0,0 +1,81 @@
+import logging
+from typing import List, Sequence, Tuple
+import numpy as np
+from inference_backends import RawDetections
+
+logger = logging.getLogger(__name__)
+
+Tile = Tuple[int, int, int, int]  # x1, y1, x2, y2 in frame pixels
+
+
+def _starts(length: int, tile_size: int, stride: int) -> List[int]:
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    return starts + [length - tile_size]  # Last tile sits flush with the frame edge
+
+
+def tile_grid(height: int, width: int, tile_size: int = 640, overlap: float = 0.2) -> List[Tile]:
+    """Overlapping tiles of at most ``tile_size`` pixels that cover the whole frame."""
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _starts(height, tile_size, stride)
+        for x in _starts(width, tile_size, stride)
+    ]
+
+
+def select_tiles(tiles: Sequence[Tile], boxes: np.ndarray, scores: np.ndarray, max_tiles: int) -> List[Tile]:
+    """Tiles overlapping at least one coarse-pass box, the most confident ``max_tiles`` of them."""
+    if len(boxes) == 0:
+        return []
+    grid = np.asarray(tiles, dtype=np.float32).reshape(-1, 4)
+    overlaps = ((grid[:, None, 0] < boxes[None, :, 2]) & (grid[:, None, 2] > boxes[None, :, 0])
+                & (grid[:, None, 1] < boxes[None, :, 3]) & (grid[:, None, 3] > boxes[None, :, 1]))
+    weight = (overlaps * scores[None, :]).sum(axis=1)
+    ranked = [i for i in np.argsort(-weight, kind="stable") if weight[i] > 0][:max(1, max_tiles)]
+    return [tiles[i] for i in sorted(ranked)]
+
+
+def _suppress(boxes: np.ndarray, scores: np.ndarray, threshold: float) -> np.ndarray:
+    """Greedy suppression on intersection over the smaller box.
+
+    A box cut off at a tile border lies almost entirely inside the full box
+    from the neighbouring tile, so plain IoU would keep both.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = inter_w * inter_h
+        overlap = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def merge_detections(parts: Sequence[RawDetections], offsets: Sequence[Tuple[int, int]],
+                     overlap_threshold: float, max_det: int) -> RawDetections:
+    """Shift per-tile detections into frame coordinates and merge duplicates across tiles, per class."""
+    if not parts:
+        return RawDetections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+    xyxy = np.concatenate([
+        np.asarray(part.xyxy, dtype=np.float32).reshape(-1, 4) + np.array([dx, dy, dx, dy], dtype=np.float32)
+        for part, (dx, dy) in zip(parts, offsets)
+    ])
+    conf = np.concatenate([np.asarray(part.conf, dtype=np.float32).reshape(-1) for part in parts])
+    cls = np.concatenate([np.asarray(part.cls, dtype=np.int64).reshape(-1) for part in parts])
+    if len(xyxy) == 0:
+        return RawDetections(xyxy, conf, cls)
+    # Offset each class into its own region so one pass never merges across classes
+    class_offset = (cls[:, None] * (xyxy.max() + 1)).astype(np.float32)
+    keep = _suppress(xyxy + class_offset, conf, overlap_threshold)[:max_det]
+    return RawDetections(xyxy[keep], conf[keep], cls[keep])
+
+
+__all__ = ["merge_detections", "select_tiles", "tile_grid"]
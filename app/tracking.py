@@ -0,0 +1,205 @@
+import itertools
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from inference_backends import RawDetections
+
+logger = logging.getLogger(__name__)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = ((a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]))[:, None]
+    area_b = ((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]))[None, :]
+    return inter / (area_a + area_b - inter + 1e-9)
+
+
+class _KalmanBox:
+    """Constant-velocity Kalman filter over a box's centre and size."""
+
+    # State: cx, cy, w, h and their per-step velocities
+    _F = np.eye(8) + np.eye(8, k=4)
+    _H = np.eye(4, 8)
+    _Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.01, 0.01])
+    _R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    def __init__(self, box: np.ndarray):
+        self.x = np.zeros(8)
+        self.x[:4] = self._to_cxcywh(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0, 1000.0])
+
+    @staticmethod
+    def _to_cxcywh(box: np.ndarray) -> np.ndarray:
+        x1, y1, x2, y2 = box
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+
+    @property
+    def box(self) -> np.ndarray:
+        cx, cy, w, h = self.x[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+    def predict(self):
+        self.x = self._F @ self.x
+        self.x[2:4] = self.x[2:4].clip(1.0)
+        self.P = self._F @ self.P @ self._F.T + self._Q
+
+    def update(self, box: np.ndarray):
+        residual = self._to_cxcywh(box) - self._H @ self.x
+        S = self._H @ self.P @ self._H.T + self._R
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ residual
+        self.P = (np.eye(8) - K @ self._H) @ self.P
+
+
+class Track:
+    """One tracked object: its filter, class and last detector confidence."""
+
+    def __init__(self, track_id: int, box: np.ndarray, class_id: int, confidence: float):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.confidence = confidence
+        self.filter = _KalmanBox(box)
+        self.misses = 0  # Detector passes since this track was last matched
+
+
+class IoUTracker:
+    """Greedy, class-aware IoU matcher with Kalman propagation between detector passes."""
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 2, first_id: int = 1):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks: List[Track] = []
+        self.lost = False  # A track went unmatched on the last detector pass
+        self.first_id = first_id
+        self._ids = itertools.count(first_id)
+        self.total_tracks = 0
+
+    def update(self, detections: RawDetections) -> np.ndarray:
+        """Match a detector pass to the tracks; returns a track id per detection."""
+        for track in self.tracks:
+            track.filter.predict()
+        boxes = np.asarray(detections.xyxy, dtype=np.float64).reshape(-1, 4)
+        track_ids = np.zeros(len(boxes), dtype=np.int64)
+        track_boxes = np.array([t.filter.box for t in self.tracks]).reshape(-1, 4)
+        ious = iou_matrix(track_boxes, boxes)
+        if ious.size:
+            # Only same-class pairs may match
+            same_class = np.array([t.class_id for t in self.tracks])[:, None] == detections.cls[None, :]
+            ious = np.where(same_class, ious, 0.0)
+
+        matched_tracks, matched_dets = set(), set()
+        for flat in np.argsort(ious, axis=None)[::-1]:
+            t, d = np.unravel_index(flat, ious.shape)
+            if ious[t, d] < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_dets:
+                continue
+            track = self.tracks[t]
+            track.filter.update(boxes[d])
+            track.confidence = float(detections.conf[d])
+            track.misses = 0
+            track_ids[d] = track.track_id
+            matched_tracks.add(t)
+            matched_dets.add(d)
+
+        self.lost = False
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+                self.lost = True
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_missed]
+
+        for d in range(len(boxes)):
+            if d not in matched_dets:
+                track = Track(next(self._ids), boxes[d], int(detections.cls[d]), float(detections.conf[d]))
+                self.tracks.append(track)
+                self.total_tracks += 1
+                track_ids[d] = track.track_id
+        return track_ids
+
+    @property
+    def next_id(self) -> int:
+        """Id the next new track will get, for continuing the numbering in a later session."""
+        return self.first_id + self.total_tracks
+
+    def predict(self) -> Tuple[RawDetections, np.ndarray]:
+        """Advance every live track one frame without the detector."""
+        live = [t for t in self.tracks if t.misses == 0]
+        for track in live:
+            track.filter.predict()
+        boxes = np.array([t.filter.box for t in live], dtype=np.float32).reshape(-1, 4)
+        detections = RawDetections(
+            boxes,
+            np.array([t.confidence for t in live], dtype=np.float32),
+            np.array([t.class_id for t in live], dtype=np.int64)
+        )
+        return detections, np.array([t.track_id for t in live], dtype=np.int64)
+
+
+class TrackingSession:
+    """Decides, frame by frame, whether to run the detector or propagate tracks.
+
+    The detector runs on the first frame, every ``detect_interval`` frames,
+    after a scene change, and on the frame after a track was lost.
+    """
+
+    def __init__(self, detect_interval: int = 5, iou_threshold: float = 0.3, max_missed: int = 2,
+                 scene_change_threshold: float = 0.6, first_track_id: int = 1):
+        self.detect_interval = max(1, detect_interval)
+        self.scene_change_threshold = scene_change_threshold
+        self.tracker = IoUTracker(iou_threshold, max_missed, first_track_id)
+        self.frames_since_detect = 0
+        self._reference_hist: Optional[np.ndarray] = None
+        self.detector_calls = 0
+        self.tracked_frames = 0
+        self.redetect_reasons = {"initial": 0, "interval": 0, "scene_change": 0, "lost": 0}
+
+    @staticmethod
+    def _histogram(frame: np.ndarray) -> np.ndarray:
+        import cv2
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        hist = cv2.calcHist([cv2.resize(gray, (64, 64))], [0], None, [32], [0, 256])
+        return cv2.normalize(hist, hist).flatten()
+
+    def redetect_reason(self, frame: np.ndarray) -> Optional[str]:
+        """Why the detector must run on this frame, or None to propagate tracks."""
+        import cv2
+        if self._reference_hist is None:
+            return "initial"
+        if self.frames_since_detect + 1 >= self.detect_interval:
+            return "interval"
+        if self.tracker.lost:
+            return "lost"
+        similarity = cv2.compareHist(self._reference_hist, self._histogram(frame), cv2.HISTCMP_CORREL)
+        if similarity < self.scene_change_threshold:
+            return "scene_change"
+        return None
+
+    def detected(self, frame: np.ndarray, reason: str):
+        self.detector_calls += 1
+        self.redetect_reasons[reason] += 1
+        self.frames_since_detect = 0
+        self._reference_hist = self._histogram(frame)
+
+    def propagated(self):
+        self.tracked_frames += 1
+        self.frames_since_detect += 1
+
+    def summary(self) -> dict:
+        return {
+            "detect_interval": self.detect_interval,
+            "detector_calls": self.detector_calls,
+            "tracked_frames": self.tracked_frames,
+            "redetect_reasons": dict(self.redetect_reasons),
+            "unique_tracks": self.tracker.total_tracks
+        }
+
+
+__all__ = ["IoUTracker", "TrackingSession", "iou_matrix"]
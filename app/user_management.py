@@ -2,6 +2,8 @@ import psycopg2
 from psycopg2 import pool
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 from password_util import hash_password, verify_password
 
@@ -27,21 +29,35 @@ def _can_connect_to_db():
     except Exception:
         return False
 
-connection_pool = None
-if _can_connect_to_db():
-    connection_pool = psycopg2.pool.SimpleConnectionPool(
-        minconn=int(os.getenv('DB_POOL_MIN', 1)),
-        maxconn=int(os.getenv('DB_POOL_MAX', 5)),
-        host=_get_db_env('RDS_HOST'),
-        port=_get_db_env('RDS_PORT'),
-        database=_get_db_env('RDS_DB'),
-        user=_get_db_env('RDS_USER'),
-        password=_get_db_env('RDS_PASSWORD')
-    )
-else:
-    connection_pool = None  # Prevents OperationalError on import
+_connection_pool = None
+_unreachable_until = 0.0  # Monotonic time before which an unresolvable host is not looked up again
+_init_lock = threading.Lock()
+
+def _get_connection_pool():
+    """Create the pool on first use; None while the DB host does not resolve.
+
+    A failed lookup is remembered for DB_RETRY_SECONDS so logins during an
+    outage do not each wait on DNS.
+    """
+    global _connection_pool, _unreachable_until
+    with _init_lock:
+        if _connection_pool is None and time.monotonic() >= _unreachable_until:
+            if not _can_connect_to_db():
+                _unreachable_until = time.monotonic() + float(os.getenv('DB_RETRY_SECONDS', 30))
+                return None
+            _connection_pool = psycopg2.pool.SimpleConnectionPool(
+                minconn=int(os.getenv('DB_POOL_MIN', 1)),
+                maxconn=int(os.getenv('DB_POOL_MAX', 5)),
+                host=_get_db_env('RDS_HOST'),
+                port=_get_db_env('RDS_PORT'),
+                database=_get_db_env('RDS_DB'),
+                user=_get_db_env('RDS_USER'),
+                password=_get_db_env('RDS_PASSWORD')
+            )
+    return _connection_pool
 
 def register_user(username: str, password: str, full_name: str, role: str = 'user'):
+    connection_pool = _get_connection_pool()
     if not connection_pool:
         # Optionally, log or print a clear error for debugging
         # print("Database connection pool is not initialized.")
@@ -67,6 +83,7 @@ def register_user(username: str, password: str, full_name: str, role: str = 'use
             connection_pool.putconn(conn)
 
 def authenticate_user(username: str, password: str) -> dict:
+    connection_pool = _get_connection_pool()
     if not connection_pool:
         # Optionally, log or print a clear error for debugging
         # print("Database connection pool is not initialized.")
@@ -1,15 +1,14 @@
 # utils.py
 import yaml
 import os
-import cv2
 import numpy as np
 from typing import Dict, Any, Union, Optional
 import logging
 from pathlib import Path
 import io
 import time
-from ultralytics import YOLO
 from dotenv import load_dotenv
+from metrics import timed
 
 def load_config(config_path: str = "config/config.yaml") -> Dict[str, Any]:
     """
@@ -77,6 +76,7 @@ def setup_logging(log_dir: str = "logs", log_level: int = logging.INFO) -> None:
         print(f"Failed to configure logging: {str(e)}")
         raise
 
+@timed("image_decode_seconds", "Reading and decoding an uploaded image")
 def read_image(file: Union[str, Path, io.BytesIO]) -> np.ndarray:
     """
     Read an image file into a numpy array with validation.
@@ -90,6 +90,7 @@ def read_image(file: Union[str, Path, io.BytesIO]) -> np.ndarray:
     Raises:
         ValueError: If image cannot be read or is invalid
     """
+    import cv2
     try:
         if isinstance(file, (str, Path)):
             if not Path(file).exists():
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 2
+
+
+def _fingerprint(video_path: Path) -> str:
+    """Size plus a hash of the first MiB: cheap, and changes if a different upload reuses the name."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(video_path, "rb") as f:
+        digest.update(f.read(1 << 20))
+    return f"{video_path.stat().st_size}:{digest.hexdigest()}"
+
+
+def part_path(output_path: str, index: int) -> str:
+    """Path of the ``index``-th segment file of a checkpointed output video."""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}.part{index:03d}{path.suffix}"))
+
+
+class VideoCheckpoint:
+    """Sidecar JSON recording how far process_video got through a video.
+
+    The file sits next to the video as ``<name>.checkpoint.json`` and is only
+    honoured for the same video content and the same processing options.
+    Writes go through a temporary file and an atomic rename, so a crash
+    mid-write leaves the previous checkpoint intact. Violations are appended
+    to ``<name>.violations.jsonl`` as they are found; each checkpoint records
+    how much of that log it covers.
+    """
+
+    def __init__(self, video_path: Path, options: Dict, every_frames: int = 300):
+        self.video_path = Path(video_path)
+        self.path = self.video_path.with_name(self.video_path.name + ".checkpoint.json")
+        self.log_path = self.video_path.with_name(self.video_path.name + ".violations.jsonl")
+        self.options = options
+        self.every_frames = max(1, every_frames)
+        self.fingerprint = _fingerprint(self.video_path)
+        self.written = 0
+        self._log = None
+
+    def load(self) -> Optional[Dict]:
+        """Saved state for this video and these options, or None to start from the beginning."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if (state.get("version") != CHECKPOINT_VERSION or state.get("fingerprint") != self.fingerprint
+                or state.get("options") != json.loads(json.dumps(self.options))):
+            logger.warning(f"Checkpoint {self.path} is for a different video or options, starting over")
+            return None
+        return state
+
+    def open_log(self, offset: int = 0):
+        """Start appending violations, dropping anything logged after the checkpoint at ``offset``."""
+        self._log = open(self.log_path, "r+b" if self.log_path.exists() else "w+b")
+        self._log.truncate(offset)
+        self._log.seek(offset)
+
+    def log(self, violations: List[Dict]):
+        for violation in violations:
+            self._log.write(json.dumps(violation).encode() + b"\n")
+
+    def read_violations(self, offset: int) -> Iterator[Dict]:
+        """Violations logged before the checkpoint at ``offset``, in order."""
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                offset -= len(line)
+                if offset < 0:
+                    break
+                violation = json.loads(line)
+                if violation.get("bbox") is not None:
+                    violation["bbox"] = tuple(violation["bbox"])
+                yield violation
+
+    def save(self, state: Dict):
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            state = dict(state, violations_offset=self._log.tell())
+        state = dict(state, version=CHECKPOINT_VERSION, fingerprint=self.fingerprint, options=self.options)
+        partial = self.path.with_suffix(".tmp")
+        with open(partial, "w") as f:
+            json.dump(state, f)
+        os.replace(partial, self.path)
+        self.written += 1
+        logger.info(f"Checkpoint saved at frame {state['last_frame']} of {self.video_path.name}")
+
+    def close_log(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def remove(self):
+        self.close_log()
+        self.path.unlink(missing_ok=True)
+        self.log_path.unlink(missing_ok=True)
+
+
+def concat_parts(parts: List[str], output_path: str, fps: float, size: Tuple[int, int], fourcc: str = "avc1"):
+    """Join segment files into ``output_path`` and delete them.
+
+    Uses ffmpeg's concat demuxer (no re-encode) when ffmpeg is installed,
+    otherwise re-encodes the segments with OpenCV. A single segment is
+    renamed into place.
+    """
+    parts = [part for part in parts if Path(part).exists()]
+    if not parts:
+        raise ValueError(f"No segment files to join into {output_path}")
+    if len(parts) == 1:
+        os.replace(parts[0], output_path)
+        return
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        listing = Path(output_path).with_suffix(".parts.txt")
+        listing.write_text("".join(f"file '{Path(part).resolve()}'\n" for part in parts))
+        try:
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                            "-i", str(listing), "-c", "copy", output_path], check=True)
+            for part in parts:
+                Path(part).unlink(missing_ok=True)
+            return
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"ffmpeg concat failed ({e}), re-encoding segments instead")
+        finally:
+            listing.unlink(missing_ok=True)
+
+    import cv2
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+    try:
+        for part in parts:
+            cap = cv2.VideoCapture(part)
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                writer.write(frame)
+            cap.release()
+    finally:
+        writer.release()
+    for part in parts:
+        Path(part).unlink(missing_ok=True)
+
+
+__all__ = ["VideoCheckpoint", "concat_parts", "part_path"]
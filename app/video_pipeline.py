@@ -0,0 +1,542 @@
+import bisect
+import logging
+import math
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_END_OF_STREAM = None
+
+
+def detected_violations(violations: List[Dict]) -> List[Dict]:
+    """Violations the model actually saw in the frame.
+
+    Leaves out the ``missing_*`` entries added for critical PPE that was not
+    detected at all: an empty or static scene produces those on every frame,
+    so they say nothing about activity.
+    """
+    return [violation for violation in violations if violation.get("bbox") is not None]
+
+
+class StageStats:
+    """Busy time, wait time and item count for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def add(self, other: "StageStats"):
+        """Fold in the figures of another run of the same stage."""
+        self.items += other.items
+        self.busy_seconds += other.busy_seconds
+        self.wait_seconds += other.wait_seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "wait_seconds": round(self.wait_seconds, 4),
+            "avg_ms": round(1000 * self.busy_seconds / self.items, 3) if self.items else 0.0
+        }
+
+
+def _add_exact(partials: List[float], x: float):
+    """Add ``x`` to a list of non-overlapping partial sums (Shewchuk), keeping the total exact."""
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+
+
+class VideoTotals:
+    """Running aggregates of a video run in constant memory, independent of how many violations it finds.
+
+    The confidence sum is kept exact, so the average comes out bit-for-bit the
+    same whether the frames were processed in one run, resumed from a
+    checkpoint or merged from parallel segments.
+    """
+
+    def __init__(self):
+        self.processed_frames = 0
+        self.total_detections = 0
+        self.total_violations = 0
+        self.critical_violations = 0
+        self.violation_frames = 0
+        self.violation_track_ids = set()  # Grows with distinct tracked objects, not with frames
+        self._confidence_partials: List[float] = []
+
+    def add_violation(self, violation: Dict):
+        self.total_violations += 1
+        if violation.get("critical", False):
+            self.critical_violations += 1
+        _add_exact(self._confidence_partials, violation["confidence"])
+        if "track_id" in violation:
+            self.violation_track_ids.add(violation["track_id"])
+
+    def add_columns(self, confidence: np.ndarray, critical: np.ndarray, track_ids: np.ndarray,
+                    chunk: int = 1 << 16):
+        """add_violation for violations held as arrays, e.g. a ViolationBatch; track id -1 means untracked."""
+        self.total_violations += len(confidence)
+        self.critical_violations += int(np.count_nonzero(critical))
+        for start in range(0, len(confidence), chunk):  # Chunked, so no full-length list is ever built
+            for value in confidence[start:start + chunk].tolist():
+                _add_exact(self._confidence_partials, value)
+        self.violation_track_ids.update(np.unique(track_ids[track_ids >= 0]).tolist())
+
+    def add_frame(self, violations: List[Dict], detections: int):
+        self.processed_frames += 1
+        self.total_detections += detections
+        if violations:
+            self.violation_frames += 1
+        for violation in violations:
+            self.add_violation(violation)
+
+    def snapshot(self) -> Dict:
+        """Totals so far, without the figures that need the whole video's frame count."""
+        return {
+            "processed_frames": self.processed_frames,
+            "total_detections": self.total_detections,
+            "total_violations": self.total_violations,
+            "critical_violations": self.critical_violations,
+            "avg_confidence": math.fsum(self._confidence_partials) / self.total_violations
+            if self.total_violations else 0.0,
+            "violation_frames": self.violation_frames,
+            "compliance_rate": 1 - (self.total_violations / self.total_detections)
+            if self.total_detections > 0 else 1.0
+        }
+
+    def summary(self, frame_count: int, fps: float) -> Dict:
+        """The headline video_metrics figures once the run is over."""
+        summary = {"total_frames": frame_count}
+        summary.update(self.snapshot())
+        summary["processing_fps"] = self.processed_frames / (frame_count / fps) if frame_count > 0 else 0
+        return summary
+
+    def to_state(self) -> Dict:
+        return {
+            "processed_frames": self.processed_frames,
+            "total_detections": self.total_detections,
+            "total_violations": self.total_violations,
+            "critical_violations": self.critical_violations,
+            "violation_frames": self.violation_frames,
+            "violation_track_ids": sorted(self.violation_track_ids),
+            "confidence_partials": list(self._confidence_partials)
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "VideoTotals":
+        totals = cls()
+        for name in ("processed_frames", "total_detections", "total_violations", "critical_violations",
+                     "violation_frames"):
+            setattr(totals, name, state[name])
+        totals.violation_track_ids = set(state["violation_track_ids"])
+        totals._confidence_partials = list(state["confidence_partials"])
+        return totals
+
+
+class QueueStats:
+    """Depth samples of a bounded queue plus the time producers spent blocked on it."""
+
+    def __init__(self, q: queue.Queue):
+        self.queue = q
+        self.samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+
+    def sample(self):
+        depth = self.queue.qsize()
+        self.samples += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self) -> Dict:
+        return {
+            "capacity": self.queue.maxsize,
+            "max_depth": self.max_depth,
+            "avg_depth": round(self.depth_total / self.samples, 2) if self.samples else 0.0,
+            "producer_blocked_seconds": round(self.blocked_seconds, 4)
+        }
+
+
+class _StageThread(threading.Thread):
+    """Base class for the decoder/encoder threads with cooperative shutdown."""
+
+    def __init__(self, name: str, queue_size: int):
+        super().__init__(name=name, daemon=True)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.queue_stats = QueueStats(self.queue)
+        self.stats = StageStats(name)
+        self.error: Optional[BaseException] = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _put(self, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopped (backpressure)."""
+        start = time.perf_counter()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.queue_stats.blocked_seconds += time.perf_counter() - start
+
+
+class FrameSampler:
+    """Chooses which 1-based frame numbers of a video get decoded.
+
+    Exactly one policy applies: an explicit list of frame numbers, a target
+    sampling rate in frames per second, or a fixed stride of every
+    ``skip_frames``-th frame.
+    """
+
+    def __init__(self, fps: float, skip_frames: int = 1, sample_fps: Optional[float] = None,
+                 frame_numbers: Optional[Sequence[int]] = None):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.skip_frames = max(1, int(skip_frames))
+        self.sample_fps = sample_fps
+        self.frame_numbers = sorted({int(n) for n in frame_numbers if n >= 1}) if frame_numbers is not None else None
+        if sample_fps is not None and sample_fps <= 0:
+            raise ValueError(f"sample_fps must be positive, got {sample_fps}")
+
+    @classmethod
+    def for_video(cls, fps: float, total_frames: int, sample_fps: Optional[float] = None,
+                  frame_numbers: Optional[Sequence[int]] = None, default_fps: float = 3.0,
+                  full_below_seconds: float = 10.0) -> "FrameSampler":
+        """The default sampling policy of process_video for a video of this length."""
+        # Adjust processing based on video length
+        skip_frames = max(1, int(fps / default_fps))  # Long videos are sampled at about default_fps
+        if total_frames / fps < full_below_seconds:  # Short videos get full processing
+            skip_frames = 1
+        return cls(fps, skip_frames, sample_fps=sample_fps, frame_numbers=frame_numbers)
+
+    @property
+    def output_fps(self) -> float:
+        """Frame rate for an output video made of the sampled frames."""
+        if self.sample_fps is not None:
+            return min(self.sample_fps, self.fps)
+        return self.fps / self.skip_frames
+
+    def next_frame(self, after: int) -> Optional[int]:
+        """First frame number to decode after frame ``after``, or None when sampling is done."""
+        if self.frame_numbers is not None:
+            index = bisect.bisect_right(self.frame_numbers, after)
+            return self.frame_numbers[index] if index < len(self.frame_numbers) else None
+        if self.sample_fps is not None:
+            step = self.fps / self.sample_fps
+            k = int(after / step) + 1
+            while max(1, round(k * step)) <= after:
+                k += 1
+            return max(1, round(k * step))
+        return (after // self.skip_frames + 1) * self.skip_frames
+
+
+class MotionGate:
+    """Decides whether a sampled frame changed enough to be worth running the detector on.
+
+    Each frame is downscaled to grayscale and compared with the last frame
+    that was analysed. If fewer than ``threshold`` of its pixels moved by more
+    than ``pixel_delta`` grey levels, the frame is skipped and the caller reuses
+    the previous results. After ``max_stale_seconds`` without a detector pass
+    the next frame is analysed regardless.
+    """
+
+    def __init__(self, threshold: float = 0.01, pixel_delta: int = 25, max_stale_seconds: float = 10.0,
+                 size: Tuple[int, int] = (96, 64)):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.max_stale_seconds = max_stale_seconds
+        self.size = size
+        self._reference: Optional[np.ndarray] = None
+        self._reference_time = 0.0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.stale_refreshes = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        import cv2
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # INTER_AREA averages out sensor noise that would otherwise read as motion
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def motion_score(self, thumbnail: np.ndarray) -> float:
+        """Fraction of thumbnail pixels that changed since the reference frame."""
+        return float(np.count_nonzero(np.abs(thumbnail - self._reference) > self.pixel_delta)) / thumbnail.size
+
+    def should_infer(self, frame: np.ndarray, timestamp: float) -> bool:
+        """True when ``frame`` needs a detector pass; it then becomes the new reference."""
+        self.frames_checked += 1
+        thumbnail = self._thumbnail(frame)
+        if self._reference is not None:
+            stale = timestamp - self._reference_time >= self.max_stale_seconds
+            if not stale and self.motion_score(thumbnail) < self.threshold:
+                self.frames_skipped += 1
+                return False
+            if stale:
+                self.stale_refreshes += 1
+        self._reference = thumbnail
+        self._reference_time = timestamp
+        return True
+
+    def as_dict(self) -> Dict:
+        return {
+            "frames_checked": self.frames_checked,
+            "frames_skipped": self.frames_skipped,
+            "skip_rate": round(self.frames_skipped / self.frames_checked, 4) if self.frames_checked else 0.0,
+            "stale_refreshes": self.stale_refreshes
+        }
+
+
+class AdaptiveSampler(FrameSampler):
+    """Sampling rate that follows violation activity and the detector's throughput.
+
+    Starts at ``base_fps``; a frame with violations jumps the rate to
+    ``max_fps`` for ``hold_seconds`` of video, after which compliant frames
+    back off by ``quiet_backoff`` per analysed frame and frames that barely
+    changed (per a MotionGate comparison) by the steeper ``static_backoff``.
+    Only violations with a box count as activity; the ``missing_*`` entries
+    for PPE that was not seen at all are treated like a compliant frame. The
+    rate is also capped so that analysing it costs no more wall time than
+    the video lasts divided by ``realtime_factor``; 0 disables the cap.
+
+    The decode thread reads ahead by its queue depth, so feedback from
+    observe() reaches the sampling decisions that many frames late. Frames
+    skipped before a violation are not revisited.
+    """
+
+    def __init__(self, fps: float, base_fps: float = 3.0, min_fps: float = 0.5, max_fps: float = 10.0,
+                 hold_seconds: float = 2.0, quiet_backoff: float = 0.85, static_backoff: float = 0.6,
+                 realtime_factor: float = 1.0, motion: Optional[MotionGate] = None):
+        super().__init__(fps, sample_fps=min(max(base_fps, min_fps), max_fps, fps if fps and fps > 0 else 30.0))
+        if not 0 < min_fps <= max_fps:
+            raise ValueError(f"Need 0 < min_fps <= max_fps, got {min_fps} and {max_fps}")
+        self.min_fps = min(min_fps, self.fps)
+        self.max_fps = min(max_fps, self.fps)
+        self.hold_seconds = hold_seconds
+        self.quiet_backoff = quiet_backoff
+        self.static_backoff = static_backoff
+        self.realtime_factor = realtime_factor
+        self.motion = motion or MotionGate(max_stale_seconds=float("inf"))
+        self.rate = self.sample_fps
+        self._hold_until = float("-inf")
+        self._cost: Optional[float] = None  # Moving average of seconds spent per analysed frame
+        self._lock = threading.Lock()  # observe() runs on the inference thread, next_frame() on the decoder
+        self.frames_observed = 0
+        self.violation_boosts = 0
+        self.static_frames = 0
+        self.lag_limited_frames = 0
+        self._rate_total = 0.0
+
+    def next_frame(self, after: int) -> Optional[int]:
+        with self._lock:
+            step = self.fps / self.rate
+        return after + max(1, int(round(step)))
+
+    def observe(self, frame: np.ndarray, timestamp: float, violations: List[Dict], seconds: float):
+        """Feed back one analysed frame: its violations and the processing time it took.
+
+        Only detected violations raise the rate; see detected_violations.
+        """
+        changed = self.motion.should_infer(frame, timestamp)
+        violations = detected_violations(violations)
+        with self._lock:
+            self.frames_observed += 1
+            self._cost = seconds if self._cost is None else 0.8 * self._cost + 0.2 * seconds
+            rate = self.rate
+            if violations:
+                self._hold_until = timestamp + self.hold_seconds
+                rate = self.max_fps
+                self.violation_boosts += 1
+            elif timestamp > self._hold_until:
+                rate *= self.quiet_backoff if changed else self.static_backoff
+            if not changed:
+                self.static_frames += 1
+            rate = min(max(rate, self.min_fps), self.max_fps)
+            if self.realtime_factor > 0 and self._cost > 0:
+                affordable = 1.0 / (self.realtime_factor * self._cost)
+                if rate > affordable:
+                    rate = max(self.min_fps, affordable)
+                    self.lag_limited_frames += 1
+            self.rate = rate
+            self._rate_total += rate
+
+    @property
+    def output_fps(self) -> float:
+        """Output videos run at the highest sampling rate; FrameWriter repeats frames to fill slower stretches."""
+        return self.max_fps
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "min_fps": self.min_fps,
+                "max_fps": self.max_fps,
+                "final_fps": round(self.rate, 3),
+                "mean_fps": round(self._rate_total / self.frames_observed, 3) if self.frames_observed else None,
+                "frames_observed": self.frames_observed,
+                "violation_boosts": self.violation_boosts,
+                "static_frames": self.static_frames,
+                "lag_limited_frames": self.lag_limited_frames
+            }
+
+
+class FrameReader(_StageThread):
+    """Decoder stage: reads frames from a cv2.VideoCapture and queues every sampled one.
+
+    Frames the sampler skips are only grabbed (demuxed and decoded but never
+    converted to BGR or copied), and gaps of at least ``seek_min_gap`` frames
+    are crossed with a keyframe seek instead. Items are
+    ``(frame_number, timestamp_seconds, frame)`` tuples, with 1-based frame
+    numbers, followed by an end-of-stream marker. With ``start_after`` the
+    first sampled frame is the one after that frame number, and sampling
+    stops after ``end_frame`` when it is set.
+    """
+
+    def __init__(self, cap, sampler: FrameSampler, queue_size: int = 32, seek_min_gap: int = 60,
+                 start_after: int = 0, end_frame: Optional[int] = None):
+        super().__init__("decode", queue_size)
+        self.cap = cap
+        self.sampler = sampler
+        self.seek_min_gap = max(1, seek_min_gap)
+        self.start_after = start_after
+        self.end_frame = end_frame
+        self.frames_read = 0
+        self.reached_end = False  # True when the video ran out before the sampler did
+        self.seeks = 0
+        self.grabs_skipped = 0
+
+    def _advance_to(self, target: int) -> bool:
+        """Position the capture so the next grab() returns frame ``target``."""
+        import cv2
+        gap = target - self.frames_read - 1
+        if gap >= self.seek_min_gap:
+            # CAP_PROP_POS_FRAMES seeks to the preceding keyframe and decodes forward
+            if self.cap.set(cv2.CAP_PROP_POS_FRAMES, target - 1) and \
+                    int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == target - 1:
+                self.frames_read = target - 1
+                self.seeks += 1
+                return True
+            logger.debug(f"Seek to frame {target} not supported, grabbing instead")
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.frames_read)  # Undo a partial seek
+        while self.frames_read < target - 1:
+            if not self.cap.grab():
+                return False
+            self.frames_read += 1
+            self.grabs_skipped += 1
+        return True
+
+    def run(self):
+        import cv2
+        try:
+            target = self.sampler.next_frame(self.start_after)
+            if self.end_frame is not None and target is not None and target > self.end_frame:
+                target = None
+            while target is not None and self.cap.isOpened() and not self._stop_event.is_set():
+                start = time.perf_counter()
+                ok = self._advance_to(target) and self.cap.grab()
+                if ok:
+                    ok, frame = self.cap.retrieve()
+                self.stats.busy_seconds += time.perf_counter() - start
+                if not ok:
+                    self.reached_end = True
+                    break
+
+                self.frames_read = target
+                timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                self.stats.items += 1
+                if not self._put((target, timestamp, frame)):
+                    break
+                target = self.sampler.next_frame(target)
+                if self.end_frame is not None and target is not None and target > self.end_frame:
+                    break
+        except Exception as e:
+            logger.error(f"Video decode failed after frame {self.frames_read}: {e}")
+            self.error = e
+        finally:
+            self._put(_END_OF_STREAM)
+
+    def get(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        """Next sampled frame, or None once the video is exhausted."""
+        self.queue_stats.sample()
+        return self.queue.get()
+
+
+class FrameWriter(_StageThread):
+    """Encoder stage: writes annotated frames to a cv2.VideoWriter off the inference thread.
+
+    With ``fps`` set, frames written with a timestamp are repeated or dropped
+    so that each one appears at its own time in a video encoded at ``fps``;
+    that keeps playback timing right when the sampling rate varies.
+    """
+
+    def __init__(self, writer, queue_size: int = 32, fps: Optional[float] = None):
+        super().__init__("encode", queue_size)
+        self.writer = writer
+        self.fps = fps
+        self.frames_repeated = 0
+        self.frames_dropped = 0
+        self._pending = None  # Held until the next frame's timestamp says how long it stays on screen
+        self._pending_slot = 0
+
+    def run(self):
+        while True:
+            start = time.perf_counter()
+            frame = self.queue.get()
+            self.stats.wait_seconds += time.perf_counter() - start
+            if frame is _END_OF_STREAM:
+                break
+            if self.error is not None:
+                continue  # Keep draining so the producer never blocks on a dead writer
+            try:
+                start = time.perf_counter()
+                if hasattr(frame, "render"):
+                    frame = frame.render()  # Lazily annotated frames are drawn here, off the inference thread
+                self.writer.write(frame)
+                self.stats.busy_seconds += time.perf_counter() - start
+                self.stats.items += 1
+            except Exception as e:
+                logger.error(f"Video encode failed: {e}")
+                self.error = e
+
+    def write(self, frame, timestamp: Optional[float] = None):
+        self.queue_stats.sample()
+        if self.fps is None or timestamp is None:
+            self._put(frame)
+            return
+        slot = int(round(timestamp * self.fps))  # Output frame index this frame starts at
+        if self._pending is None:
+            self._pending_slot = slot
+        elif slot > self._pending_slot:
+            for _ in range(slot - self._pending_slot):
+                self._put(self._pending)
+            self.frames_repeated += slot - self._pending_slot - 1
+            self._pending_slot = slot
+        else:
+            self.frames_dropped += 1  # Two frames for one output slot; the later one is shown
+        self._pending = frame
+
+    def close(self):
+        """Flush queued frames and wait for the encoder to finish."""
+        if self._pending is not None:
+            self._put(self._pending)
+            self._pending = None
+        self.queue.put(_END_OF_STREAM)
+        self.join()
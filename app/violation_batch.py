@@ -0,0 +1,192 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One violation per row, about 50 bytes instead of several hundred for the equivalent dict
+VIOLATION_DTYPE = np.dtype([
+    ("type_id", np.uint16),  # Index into ViolationBatch.types
+    ("confidence", np.float64),
+    ("bbox", np.int32, (4,)),  # x1, y1, x2, y2; meaningless unless has_bbox
+    ("has_bbox", np.bool_),
+    ("critical", np.bool_),
+    ("frame", np.int32),  # 1-based; 0 for still images
+    ("timestamp", np.float64),  # NaN for still images
+    ("frame_time", np.float64),
+    ("track_id", np.int32)  # -1 when the violation was not tracked
+])
+
+_NO_TRACK = -1
+
+
+class ViolationBatch:
+    """Violation records as a NumPy structured array with interned violation types.
+
+    Rows are appended into a buffer that grows geometrically, so collecting a
+    day of video costs amortized O(1) per violation and tens of MB rather
+    than GBs. Only the fields process_video produces are kept; any other
+    dict keys are dropped by from_dicts.
+    """
+
+    def __init__(self, types: Sequence[str] = (), capacity: int = 0):
+        self.types: List[str] = list(types)
+        self._type_ids = {name: i for i, name in enumerate(self.types)}
+        self._data = np.zeros(capacity, dtype=VIOLATION_DTYPE)
+        self._size = 0
+
+    @property
+    def records(self) -> np.ndarray:
+        """The filled rows; a view, so copy it before appending more if it must stay valid."""
+        return self._data[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self.records.nbytes
+
+    def type_id(self, violation_type: str) -> int:
+        type_id = self._type_ids.get(violation_type)
+        if type_id is None:
+            type_id = self._type_ids[violation_type] = len(self.types)
+            self.types.append(violation_type)
+        return type_id
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed > len(self._data):
+            grown = np.zeros(max(needed, 2 * len(self._data), 64), dtype=VIOLATION_DTYPE)
+            grown[:self._size] = self.records
+            self._data = grown
+
+    def append(self, violations: Iterable[Dict]):
+        """Add violations in the dict form returned by detect and process_video."""
+        violations = list(violations)
+        if not violations:
+            return
+        self._reserve(len(violations))
+        rows = self._data[self._size:self._size + len(violations)]
+        for row, violation in zip(rows, violations):
+            bbox = violation.get("bbox")
+            timestamp = violation.get("timestamp")
+            frame_time = violation.get("frame_time")
+            row["type_id"] = self.type_id(violation["violation_type"])
+            row["confidence"] = violation["confidence"]
+            if bbox is not None:
+                row["bbox"] = bbox
+                row["has_bbox"] = True
+            row["critical"] = violation.get("critical", False)
+            row["frame"] = violation.get("frame", 0)
+            row["timestamp"] = np.nan if timestamp is None else timestamp
+            row["frame_time"] = np.nan if frame_time is None else frame_time
+            row["track_id"] = violation.get("track_id", _NO_TRACK)
+        self._size += len(violations)
+
+    def extend(self, other: "ViolationBatch"):
+        """Append another batch's rows, remapping its type ids onto this batch's."""
+        if not len(other):
+            return
+        remap = np.array([self.type_id(name) for name in other.types], dtype=np.uint16)
+        self._reserve(len(other))
+        rows = self._data[self._size:self._size + len(other)]
+        rows[:] = other.records
+        rows["type_id"] = remap[other.records["type_id"]]
+        self._size += len(other)
+
+    @classmethod
+    def from_dicts(cls, violations: Iterable[Dict]) -> "ViolationBatch":
+        batch = cls()
+        batch.append(violations)
+        return batch
+
+    @classmethod
+    def concat(cls, batches: Iterable["ViolationBatch"]) -> "ViolationBatch":
+        merged = cls()
+        for batch in batches:
+            merged.extend(batch)
+        return merged
+
+    def to_dicts(self) -> List[Dict]:
+        """The same records in the dict form used everywhere else."""
+        records = self.records
+        names = [self.types[i] for i in records["type_id"].tolist()]
+        violations = []
+        for i, (confidence, bbox, has_bbox, critical, frame, timestamp, frame_time, track_id) in enumerate(zip(
+                records["confidence"].tolist(), records["bbox"].tolist(), records["has_bbox"].tolist(),
+                records["critical"].tolist(), records["frame"].tolist(), records["timestamp"].tolist(),
+                records["frame_time"].tolist(), records["track_id"].tolist())):
+            violation = {
+                "violation_type": names[i],
+                "confidence": confidence,
+                "bbox": tuple(bbox) if has_bbox else None,
+                "critical": critical
+            }
+            if track_id != _NO_TRACK:
+                violation["track_id"] = track_id
+            if frame:
+                violation.update({"timestamp": timestamp, "frame": frame, "frame_time": frame_time})
+            violations.append(violation)
+        return violations
+
+    def counts_by_type(self) -> Dict[str, int]:
+        counts = np.bincount(self.records["type_id"], minlength=len(self.types))
+        return {name: int(count) for name, count in zip(self.types, counts.tolist()) if count}
+
+    def per_frame_counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Frame numbers that had violations and how many each had, in frame order."""
+        return np.unique(self.records["frame"], return_counts=True)
+
+    def frame_rates(self, processed_frames: int) -> Dict:
+        """How often processed frames had violations, and how many per frame."""
+        frames, counts = self.per_frame_counts()
+        return {
+            "violation_frames": len(frames),
+            "violation_frame_rate": len(frames) / processed_frames if processed_frames else 0.0,
+            "violations_per_frame": len(self) / processed_frames if processed_frames else 0.0,
+            "max_violations_per_frame": int(counts.max()) if len(counts) else 0
+        }
+
+    def confidence_stats(self, violation_type: Optional[str] = None) -> Dict:
+        """Mean, spread and percentiles of confidence, overall or for one violation type."""
+        confidence = self.records["confidence"]
+        if violation_type is not None:
+            type_id = self._type_ids.get(violation_type)
+            confidence = confidence[self.records["type_id"] == type_id] if type_id is not None else confidence[:0]
+        if not len(confidence):
+            return {"count": 0, "mean": 0.0, "std": 0.0, "min": 0.0, "max": 0.0, "p50": 0.0, "p95": 0.0}
+        p50, p95 = np.percentile(confidence, [50, 95]).tolist()
+        return {
+            "count": int(len(confidence)),
+            "mean": float(confidence.mean()),
+            "std": float(confidence.std()),
+            "min": float(confidence.min()),
+            "max": float(confidence.max()),
+            "p50": p50,
+            "p95": p95
+        }
+
+    def summary(self, processed_frames: int) -> Dict:
+        """The violation side of video_metrics, computed over the arrays in one pass each."""
+        summary = {
+            "total_violations": len(self),
+            "critical_violations": int(self.records["critical"].sum()),
+            "violations_by_type": self.counts_by_type(),
+            "confidence": self.confidence_stats()
+        }
+        summary.update(self.frame_rates(processed_frames))
+        return summary
+
+    def __getstate__(self) -> Dict:
+        # Pickle only the filled rows, e.g. when a detector worker sends a batch back
+        return {"types": self.types, "records": self.records.copy()}
+
+    def __setstate__(self, state: Dict):
+        self.types = state["types"]
+        self._type_ids = {name: i for i, name in enumerate(self.types)}
+        self._data = state["records"]
+        self._size = len(self._data)
+
+
+__all__ = ["VIOLATION_DTYPE", "ViolationBatch"]
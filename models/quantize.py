@@ -0,0 +1,215 @@
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+# Reuse the serving-side preprocessing so calibration sees exactly what inference sees
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+from inference_backends import OnnxRuntimeBackend, input_tensor, letterbox  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_CLASSES = ["helmet", "gloves", "mask", "shoes"]
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def export_onnx(weights: Path, imgsz: int = 640) -> Path:
+    """Export a trained .pt model to ONNX (FP32) next to the weights."""
+    from ultralytics import YOLO
+    return Path(YOLO(str(weights)).export(format="onnx", imgsz=imgsz))
+
+
+def validation_images(data_yaml: Path, limit: Optional[int] = None, seed: int = 0) -> List[Path]:
+    """Image files of the validation split named in a YOLO dataset.yaml."""
+    with open(data_yaml, "r") as f:
+        data = yaml.safe_load(f)
+    root = Path(data.get("path", ""))
+    if not root.is_absolute() and not root.exists():
+        root = data_yaml.parent / root  # Relative to the yaml rather than the working directory
+    val_dir = root / data["val"]
+    images = sorted(p for p in val_dir.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not images:
+        raise FileNotFoundError(f"No validation images found under {val_dir}")
+    if limit and len(images) > limit:
+        images = sorted(random.Random(seed).sample(images, limit))
+    return images
+
+
+def calibration_tensor(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """The float32 input the served model gets for a BGR ``image``: PPEDetector's letterbox, then the backend's."""
+    if max(image.shape[:2]) > max(size):
+        image, _, _ = letterbox(image, size)
+    return input_tensor([image], size)[0]
+
+
+class YoloCalibrationReader:
+    """onnxruntime CalibrationDataReader feeding letterboxed validation images."""
+
+    def __init__(self, model_path: Path, images: List[Path]):
+        import onnxruntime as ort
+        session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        height, width = model_input.shape[2:]
+        self.size = (height if isinstance(height, int) else 640, width if isinstance(width, int) else 640)
+        self.images = iter(images)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        import cv2
+        for path in self.images:
+            image = cv2.imread(str(path))
+            if image is None:
+                logger.warning(f"Skipping unreadable calibration image {path}")
+                continue
+            return {self.input_name: calibration_tensor(image, self.size)}
+        return None
+
+
+def quantize_model(fp32_path: Path, int8_path: Path, calibration_images: List[Path],
+                   per_channel: bool = True, method: str = "minmax") -> Path:
+    """Static INT8 (QDQ) quantization of the convolution weights and activations."""
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    calibrate_method = {
+        "minmax": CalibrationMethod.MinMax,
+        "entropy": CalibrationMethod.Entropy,
+        "percentile": CalibrationMethod.Percentile,
+    }[method]
+
+    quantize_static(
+        str(fp32_path),
+        str(int8_path),
+        YoloCalibrationReader(fp32_path, calibration_images),
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+        calibrate_method=calibrate_method,
+        # Keep the box decoding (Concat/Split/Softmax in the head) in float
+        op_types_to_quantize=["Conv", "MatMul"],
+    )
+
+    # Carry over the class names ultralytics stores in the export metadata
+    source, quantized = onnx.load(str(fp32_path)), onnx.load(str(int8_path))
+    existing = {prop.key for prop in quantized.metadata_props}
+    for prop in source.metadata_props:
+        if prop.key not in existing:
+            quantized.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(quantized, str(int8_path))
+    return int8_path
+
+
+def measure_latency(model_path: Path, images: List[Path], runs: int = 50, threads: int = 0) -> Dict:
+    """Single-image CPU latency through the serving backend."""
+    import cv2
+    backend = OnnxRuntimeBackend(model_path, intra_op_threads=threads)
+    frames = [frame for frame in (cv2.imread(str(p)) for p in images[:runs]) if frame is not None]
+    if not frames:
+        frames = [np.zeros((640, 640, 3), dtype=np.uint8)]
+    backend.warmup()
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        backend.predict([frames[i % len(frames)]], conf=0.25, iou=0.45, imgsz=640)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": round(float(np.mean(timings)), 2),
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "fps": round(1000 / float(np.mean(timings)), 2),
+    }
+
+
+def evaluate_map(model_path: Path, data_yaml: Path, imgsz: int = 640) -> Optional[Dict]:
+    """Per-class mAP50-95 and overall mAP50 on the validation split via ultralytics."""
+    try:
+        from ultralytics import YOLO
+        metrics = YOLO(str(model_path), task="detect").val(data=str(data_yaml), imgsz=imgsz, batch=1,
+                                                             device="cpu", verbose=False, plots=False)
+    except Exception as e:
+        logger.warning(f"mAP evaluation of {model_path} failed: {e}")
+        return None
+    names = metrics.names
+    return {
+        "map50": round(float(metrics.box.map50), 4),
+        "map50_95": round(float(metrics.box.map), 4),
+        "per_class": {names[int(c)]: round(float(metrics.box.maps[int(c)]), 4) for c in metrics.box.ap_class_index},
+    }
+
+
+def build_report(fp32_path: Path, int8_path: Path, data_yaml: Path, latency_images: List[Path],
+                 max_map_drop: float, runs: int, threads: int) -> Dict:
+    """Latency, size and accuracy of the INT8 model next to the FP32 one."""
+    report = {"fp32": {"path": str(fp32_path)}, "int8": {"path": str(int8_path)}}
+    for key, path in (("fp32", fp32_path), ("int8", int8_path)):
+        report[key]["size_bytes"] = path.stat().st_size
+        report[key]["size_mb"] = round(path.stat().st_size / 1e6, 2)
+        report[key]["latency"] = measure_latency(path, latency_images, runs=runs, threads=threads)
+        report[key]["accuracy"] = evaluate_map(path, data_yaml)
+
+    report["speedup"] = round(report["fp32"]["latency"]["mean_ms"] / report["int8"]["latency"]["mean_ms"], 2)
+    report["size_ratio"] = round(report["int8"]["size_bytes"] / report["fp32"]["size_bytes"], 3)
+
+    fp32_acc, int8_acc = report["fp32"]["accuracy"], report["int8"]["accuracy"]
+    if fp32_acc and int8_acc:
+        drops = {
+            name: round(fp32_acc["per_class"].get(name, 0.0) - int8_acc["per_class"].get(name, 0.0), 4)
+            for name in CRITICAL_CLASSES if name in fp32_acc["per_class"]
+        }
+        report["critical_map_drop"] = drops
+        report["accepted"] = all(drop <= max_map_drop for drop in drops.values())
+    else:
+        report["critical_map_drop"] = None
+        report["accepted"] = None  # Accuracy could not be measured; review manually
+    report["max_map_drop"] = max_map_drop
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Static INT8 quantization of the PPE detector for CPU serving.")
+    parser.add_argument("--model", default="models/ppe_yolo_model.onnx",
+                        help="FP32 ONNX export, or a .pt checkpoint to export first")
+    parser.add_argument("--data", default="data/ppe/dataset.yaml", help="YOLO dataset.yaml with a val split")
+    parser.add_argument("--output", default=None, help="INT8 model path (default: <model>.int8.onnx)")
+    parser.add_argument("--calibration-images", type=int, default=200, help="Validation images used for calibration")
+    parser.add_argument("--method", choices=["minmax", "entropy", "percentile"], default="minmax")
+    parser.add_argument("--no-per-channel", action="store_true", help="Per-tensor instead of per-channel weights")
+    parser.add_argument("--latency-runs", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for the latency runs")
+    parser.add_argument("--max-map-drop", type=float, default=0.02,
+                        help="Largest accepted mAP50-95 drop on helmet/gloves/mask/shoes")
+    parser.add_argument("--report", default=None, help="JSON report path (default: <output>.report.json)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    model = Path(args.model)
+    fp32_path = export_onnx(model) if model.suffix == ".pt" else model
+    int8_path = Path(args.output) if args.output else fp32_path.with_suffix(".int8.onnx")
+    report_path = Path(args.report) if args.report else int8_path.with_suffix(".report.json")
+    data_yaml = Path(args.data)
+
+    calibration = validation_images(data_yaml, limit=args.calibration_images)
+    logger.info(f"Calibrating {fp32_path} on {len(calibration)} validation images")
+    quantize_model(fp32_path, int8_path, calibration, per_channel=not args.no_per_channel, method=args.method)
+    logger.info(f"Wrote INT8 model to {int8_path}")
+
+    report = build_report(fp32_path, int8_path, data_yaml, calibration, args.max_map_drop,
+                          args.latency_runs, args.threads)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Speedup x{report['speedup']}, size x{report['size_ratio']}, accepted: {report['accepted']}")
+    logger.info(f"Report written to {report_path}")
+    return 1 if report["accepted"] is False else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
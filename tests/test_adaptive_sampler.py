@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+pytest.importorskip("cv2")
+
+from video_pipeline import AdaptiveSampler
+
+NO_HELMET = {"violation_type": "no_helmet", "confidence": 0.8, "bbox": (5, 5, 50, 60), "critical": True}
+# What _build_result reports for a frame where no PPE was detected at all
+NOTHING_DETECTED = [{"violation_type": f"missing_{item}", "confidence": 0.9, "bbox": None, "critical": True}
+                    for item in ("helmet", "gloves", "mask", "shoes")]
+
+
+def _frame(value):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+def test_violations_raise_rate_and_quiet_footage_backs_off():
+    sampler = AdaptiveSampler(30.0, base_fps=3.0, min_fps=0.5, max_fps=10.0, hold_seconds=1.0, realtime_factor=0)
+    assert sampler.next_frame(0) == 10
+    sampler.observe(_frame(0), 0.0, [NO_HELMET], seconds=0.01)
+    assert sampler.next_frame(10) == 13
+    sampler.observe(_frame(0), 0.5, [], seconds=0.01)
+    assert sampler.rate == 10.0  # Still inside the hold
+    for i in range(20):
+        sampler.observe(_frame(0), 2.0 + i, [], seconds=0.01)
+    assert sampler.rate == 0.5
+    assert sampler.next_frame(100) == 160
+
+def test_empty_static_footage_backs_off():
+    sampler = AdaptiveSampler(30.0, base_fps=3.0, min_fps=0.5, max_fps=10.0, realtime_factor=0)
+    for i in range(10):
+        sampler.observe(_frame(0), i / 3, NOTHING_DETECTED, seconds=0.01)
+    stats = sampler.as_dict()
+    assert stats["violation_boosts"] == 0
+    assert stats["static_frames"] == 9
+    assert sampler.rate == 0.5
+
+def test_rate_capped_when_falling_behind():
+    sampler = AdaptiveSampler(30.0, base_fps=3.0, min_fps=0.5, max_fps=10.0, realtime_factor=1.0)
+    sampler.observe(_frame(0), 0.0, [NO_HELMET], seconds=0.5)
+    assert sampler.rate == pytest.approx(2.0)
+    assert sampler.as_dict()["lag_limited_frames"] == 1
+
+def test_writer_places_frames_by_timestamp():
+    from video_pipeline import FrameWriter
+
+    class Recorder:
+        def __init__(self):
+            self.frames = []
+
+        def write(self, frame):
+            self.frames.append(frame)
+
+    recorder = Recorder()
+    writer = FrameWriter(recorder, fps=10.0)
+    writer.start()
+    for name, timestamp in [("a", 0.0), ("b", 0.5), ("c", 0.52), ("d", 0.6)]:
+        writer.write(name, timestamp)
+    writer.close()
+    # "a" fills 0.0-0.5 s, "b" and "c" share one slot, "d" is the last frame
+    assert recorder.frames == ["a"] * 5 + ["c", "d"]
+    assert writer.frames_dropped == 1
@@ -0,0 +1,34 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from benchmark import compare_to_baseline, pinned_threads, summarize_latencies
+
+
+def _case(p95, fps, batch_size=1):
+    return {"backend": "torch", "threads": 0, "frame_set": "synthetic:640x480", "profile": "balanced",
+            "batch_size": batch_size, "batch_latency_ms": {"p95": p95}, "fps": fps}
+
+def test_latency_percentiles():
+    summary = summarize_latencies([i / 1000 for i in range(1, 101)])
+    assert summary["p50"] == 50.5 and summary["max"] == 100.0
+    assert summary["p95"] < summary["p99"] < 100.0
+    assert summarize_latencies([])["p95"] is None
+
+def test_regressions_beyond_tolerance_fail():
+    baseline = {"cases": [_case(10.0, 100.0), _case(20.0, 400.0, batch_size=8)]}
+    report = {"cases": [_case(11.0, 95.0), _case(30.0, 250.0, batch_size=8), _case(5.0, 10.0, batch_size=4)]}
+    regressions = compare_to_baseline(report, baseline, tolerance=0.15)
+    assert len(regressions) == 2
+    assert all(r.startswith("torch/0/synthetic:640x480/balanced/8") for r in regressions)
+
+def test_thread_pins_do_not_leak_into_later_cases(monkeypatch):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    config = {"inference": {"backend": "onnx"}}
+    with pinned_threads(config, 2):
+        assert os.environ["OMP_NUM_THREADS"] == "2" and config["inference"]["intra_op_threads"] == 2
+    assert "OMP_NUM_THREADS" not in os.environ
+    with pinned_threads({"inference": {"backend": "onnx"}}, 0):
+        assert "OMP_NUM_THREADS" not in os.environ
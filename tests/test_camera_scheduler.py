@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from camera_scheduler import CameraScheduler
+
+
+class FakeGrabber:
+    """Live feed that always has a newer frame; counts drops like LatestFrameGrabber."""
+
+    def __init__(self):
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.finished = False
+
+    def latest(self, timeout=None):
+        self.frames_captured += 1
+        return (self.frames_captured, 0.0, 0.0, np.zeros((4, 4, 3), np.uint8))
+
+    def count_dropped(self, count=1):
+        self.frames_dropped += count
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class FakeDetector:
+    def resolve_profile(self, profile, camera_id=None, source=None):
+        return {"name": "balanced"}
+
+    def detect_batch(self, images, **kwargs):
+        return [(None, [], {}) for _ in images]
+
+
+def _scheduler(cameras, batch_size=1, starvation_seconds=60.0):
+    scheduler = CameraScheduler(lambda camera_id, result: None, detector=FakeDetector(), batch_size=batch_size,
+                                starvation_seconds=starvation_seconds)
+    for camera_id, options in cameras.items():
+        scheduler.add_camera(camera_id, f"fake://{camera_id}", **options).grabber = FakeGrabber()
+    return scheduler
+
+def _round(scheduler, now):
+    chosen = scheduler.select(now)
+    scheduler._dispatch(chosen, now)
+    return [camera.camera_id for camera in chosen]
+
+
+def test_higher_priority_goes_first():
+    scheduler = _scheduler({"yard": {}, "furnace": {"priority": 1}})
+    assert [_round(scheduler, t) for t in (0.0, 0.1, 0.2)] == [["furnace"]] * 3
+
+def test_starving_camera_is_boosted_past_priority():
+    scheduler = _scheduler({"yard": {}, "furnace": {"priority": 1}}, starvation_seconds=2.0)
+    assert [_round(scheduler, t) for t in (0.0, 1.0, 2.0, 3.0)] == [["furnace"], ["furnace"], ["yard"], ["furnace"]]
+    yard = scheduler.cameras["yard"]
+    assert yard.starvation_boosts == 1
+    assert yard.grabber.frames_dropped == 2  # Replaced at t=1 and t=2 while waiting for a slot
+
+def test_weights_interleave_smoothly():
+    scheduler = _scheduler({"a": {"weight": 5}, "b": {}, "c": {}})
+    order = [_round(scheduler, t / 10)[0] for t in range(14)]
+    assert order[:7] == ["a", "a", "b", "a", "c", "a", "a"]
+    assert order[7:] == order[:7]
+
+def test_cameras_over_budget_sit_out():
+    scheduler = _scheduler({"a": {"max_fps": 1.0}, "b": {}}, batch_size=2)
+    assert [_round(scheduler, t) for t in (10.0, 10.5, 11.0)] == [["a", "b"], ["b"], ["a", "b"]]
+
+def test_camera_lag_is_exported():
+    from metrics import render_prometheus
+    scheduler = _scheduler({"gate-2": {}})
+    _round(scheduler, 10.0)
+    assert "camera_lag_seconds_gate_2_count" in render_prometheus()
+
+class EndingGrabber(FakeGrabber):
+    """File source whose last frame is published, and the stream finished, just after a take."""
+
+    def __init__(self):
+        super().__init__()
+        self._last = None
+
+    def latest(self, timeout=None):
+        if not self.finished:
+            self._last = super().latest()
+            self.finished = True
+            return None
+        item, self._last = self._last, None
+        return item
+
+def test_last_frame_of_an_ending_source_is_processed():
+    results = []
+    scheduler = CameraScheduler(lambda camera_id, result: results.append(result.frame_index),
+                                detector=FakeDetector(), batch_size=1)
+    scheduler.add_camera("file", "fake://file").grabber = EndingGrabber()
+    scheduler._run()
+    assert results == [1]
@@ -1,18 +1,34 @@
-import pytest
-from app.detection import PPEDetector
-import cv2
+import sys
+from pathlib import Path
 import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+pytest.importorskip("ultralytics")
+pytest.importorskip("cv2")
+
+from detection import PPEDetector
 
-@pytest.fixture
+
+@pytest.fixture(scope="module")
 def detector():
     return PPEDetector()
 
 def test_detection(detector):
     # Create a dummy image
     dummy_image = np.zeros((640, 640, 3), dtype=np.uint8)
-    
+
     # Test detection
-    annotated_image, violations = detector.detect(dummy_image)
-    
+    annotated_image, violations, metrics = detector.detect(dummy_image)
+
     assert isinstance(annotated_image, np.ndarray)
-    assert isinstance(violations, list)
\ No newline at end of file
+    assert annotated_image.shape == dummy_image.shape
+    assert isinstance(violations, list)
+    assert {"total_detections", "critical_violations"} <= set(metrics)
+
+def test_batch_matches_single_frames(detector):
+    images = [np.zeros((480, 640, 3), dtype=np.uint8), np.full((720, 1280, 3), 128, dtype=np.uint8)]
+    batched = detector.detect_batch(images, annotate=False, use_cache=False)
+    single = [detector.detect(image, annotate=False) for image in images]
+    assert [violations for _, violations, _ in batched] == [violations for _, violations, _ in single]
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from detection_cache import DetectionCache, cache_key
+from inference_backends import RawDetections
+
+SETTINGS = {"name": "balanced", "iou": 0.45, "imgsz": 640}
+RAW = RawDetections(np.array([[1, 2, 3, 4]], np.float32), np.array([0.9], np.float32), np.array([1]))
+
+
+def test_key_depends_on_pixels_model_and_settings():
+    image = np.zeros((8, 8, 3), np.uint8)
+    key = cache_key(image, "torch:a", SETTINGS, 0.7)
+    assert key == cache_key(image.copy(), "torch:a", SETTINGS, 0.7)
+    assert key != cache_key(image + 1, "torch:a", SETTINGS, 0.7)
+    assert key != cache_key(image, "torch:b", SETTINGS, 0.7)
+    assert key != cache_key(image, "torch:a", dict(SETTINGS, name="accurate"), 0.7)
+    assert key != cache_key(image, "torch:a", SETTINGS, 0.5)
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    DetectionCache(disk_dir=tmp_path).put("k", RAW)
+    cache = DetectionCache(disk_dir=tmp_path)
+    assert cache.get("k").xyxy.tolist() == RAW.xyxy.tolist()
+    assert cache.get("missing") is None
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_lookups_count_in_the_registry():
+    from metrics import REGISTRY
+    hits, misses = (REGISTRY.counter(name) for name in ("detection_cache_memory_hits_total",
+                                                        "detection_cache_misses_total"))
+    before = hits.value, misses.value
+    cache = DetectionCache()
+    cache.put("k", RAW)
+    cache.get("k")
+    cache.get("missing")
+    assert (hits.value - before[0], misses.value - before[1]) == (1, 1)
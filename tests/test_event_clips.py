@@ -0,0 +1,59 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from event_clips import ClipRecorder
+
+NO_HELMET = {"violation_type": "no_helmet", "confidence": 0.8, "bbox": (5, 5, 50, 60), "critical": True}
+NOTHING_DETECTED = [{"violation_type": f"missing_{item}", "confidence": 0.9, "bbox": None, "critical": True}
+                    for item in ("helmet", "gloves", "mask", "shoes")]
+
+
+class FakeWriter:
+    def __init__(self, path):
+        self.path = path
+        self.frames = []
+        self.closed = False
+
+    def write(self, frame, timestamp):
+        self.frames.append(frame)
+
+
+def _recorder(tmp_path, writers):
+    def open_writer(path):
+        writers.append(FakeWriter(path))
+        return writers[-1]
+
+    def close_writer(writer):
+        writer.closed = True
+
+    return ClipRecorder(str(tmp_path / "out.mp4"), open_writer, close_writer, fps=1.0,
+                        pre_roll_seconds=2.0, post_roll_seconds=2.0)
+
+def test_pre_and_post_roll_merge_nearby_events(tmp_path):
+    writers = []
+    recorder = _recorder(tmp_path, writers)
+    events = {5, 8, 20}
+    for second in range(30):
+        recorder.add(second + 1, float(second), f"frame{second}", [NO_HELMET] if second in events else [])
+    recorder.close_clip()
+    recorder.write_index()
+
+    # Events 3 s apart share one clip: 2 s pre-roll before 5 through 2 s post-roll after 8
+    assert [w.frames for w in writers] == [[f"frame{s}" for s in range(3, 11)],
+                                            [f"frame{s}" for s in range(18, 23)]]
+    assert all(w.closed for w in writers)
+    index = json.loads((tmp_path / "out.clips.json").read_text())["clips"]
+    assert [(c["start_time"], c["end_time"], c["violations"]) for c in index] == [(3.0, 10.0, 2), (18.0, 22.0, 1)]
+    assert recorder.summary()["frames_skipped"] == 30 - 13
+
+def test_empty_footage_writes_no_clips(tmp_path):
+    writers = []
+    recorder = _recorder(tmp_path, writers)
+    for second in range(30):
+        recorder.add(second + 1, float(second), f"frame{second}", NOTHING_DETECTED)
+    recorder.close_clip()
+    assert writers == []
+    assert recorder.summary()["count"] == 0 and recorder.summary()["frames_skipped"] == 30
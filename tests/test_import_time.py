@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "3.0"))
+DEFERRED_MODULES = ["ultralytics", "torch", "onnxruntime", "boto3", "plotly"]
+
+COLD_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % DEFERRED_MODULES
+
+
+@pytest.fixture(scope="module")
+def cold_import():
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0 and "ModuleNotFoundError" in result.stderr:
+        pytest.skip(f"App dependencies not installed: {result.stderr.strip().splitlines()[-1]}")
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_cold_import_main_within_budget(cold_import):
+    assert cold_import["seconds"] < IMPORT_BUDGET_SECONDS, (
+        f"Cold 'import main' took {cold_import['seconds']:.2f}s (budget {IMPORT_BUDGET_SECONDS}s)"
+    )
+
+def test_heavy_libraries_are_deferred(cold_import):
+    assert cold_import["loaded"] == []
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from metrics import MetricsRegistry, render_prometheus, timed
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "A stage", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    registry.counter("failures_total", "Failures").inc()
+    lines = render_prometheus(registry).splitlines()
+    assert "# TYPE failures_total counter" in lines and "failures_total 1" in lines
+    assert "# TYPE stage_seconds histogram" in lines
+    assert lines[-5:] == ['stage_seconds_bucket{le="0.1"} 1', 'stage_seconds_bucket{le="1"} 2',
+                          'stage_seconds_bucket{le="+Inf"} 2', "stage_seconds_sum 0.55", "stage_seconds_count 2"]
+
+def test_timed_counts_errors():
+    registry = MetricsRegistry()
+
+    @timed("send_seconds", registry=registry)
+    def send(fail):
+        if fail:
+            raise RuntimeError("smtp down")
+
+    send(False)
+    with pytest.raises(RuntimeError):
+        send(True)
+    assert registry.histogram("send_seconds").snapshot()["count"] == 2
+    assert registry.counter("send_errors_total").value == 1
+
+def test_histograms_keep_their_unit():
+    registry = MetricsRegistry()
+    assert registry.histogram("stage_seconds").unit == "seconds"
+    sizes = registry.histogram("batch_size", "Per batch", buckets=(1, 2, 4), unit="count")
+    sizes.observe(8)
+    assert sizes.unit == "count" and sizes.quantile(0.5) == float("inf")
@@ -0,0 +1,71 @@
+import sys
+import threading
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from micro_batcher import MicroBatcher, run_inline
+
+
+class RecordingDetector:
+    """Returns each image's fill value and records the size of every batch it ran."""
+
+    def __init__(self):
+        self.batches = []
+
+    def detect_batch(self, images, **kwargs):
+        self.batches.append((len(images), kwargs["confidence"]))
+        return [(None, [], {"value": int(image[0, 0, 0])}) for image in images]
+
+
+def _image(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_concurrent_callers_share_a_batch():
+    detector = RecordingDetector()
+    batcher = MicroBatcher(run_inline(detector.detect_batch), max_batch_size=4, max_wait_ms=2000)
+    start = threading.Barrier(4)
+    results = {}
+
+    def call(value):
+        start.wait()
+        results[value] = batcher.detect(_image(value), confidence=0.5)[2]["value"]
+
+    threads = [threading.Thread(target=call, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert results == {0: 0, 1: 1, 2: 2, 3: 3}
+    assert detector.batches == [(4, 0.5)]  # Full batch closes before the wait expires
+
+def test_different_options_never_share_a_batch():
+    detector = RecordingDetector()
+    batcher = MicroBatcher(run_inline(detector.detect_batch), max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(_image(1), confidence=0.5), batcher.submit(_image(2), confidence=0.7),
+               batcher.submit(_image(3), confidence=0.5)]
+    assert [f.result(timeout=5)[2]["value"] for f in futures] == [1, 2, 3]
+    assert sorted(detector.batches) == [(1, 0.7), (2, 0.5)]
+
+def test_batch_errors_reach_every_caller():
+    def fail(images, **kwargs):
+        raise RuntimeError("model failed")
+    batcher = MicroBatcher(run_inline(fail), max_batch_size=2, max_wait_ms=50)
+    futures = [batcher.submit(_image(0)), batcher.submit(_image(1))]
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), RuntimeError)
+
+def test_upload_batches_go_through_the_micro_batcher(monkeypatch):
+    import detection
+    sizes = []
+    def detect_batch(images, **kwargs):
+        sizes.append(len(images))
+        return [(image, [], {}) for image in images]
+    batcher = MicroBatcher(run_inline(detect_batch), max_batch_size=3, max_wait_ms=1000)
+    monkeypatch.setattr(detection, "get_micro_batcher", lambda: batcher)
+    images = [np.full((8, 8, 3), i, dtype=np.uint8) for i in range(3)]
+    results = detection.detect_ppe_batch(images, confidence=0.7)
+    assert [int(r[0][0, 0, 0]) for r in results] == [0, 1, 2]
+    assert sizes == [3]
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from parallel_video import plan_segments
+
+
+def test_segments_cover_every_frame_once():
+    segments = plan_segments(1000, 4)
+    assert segments[0][0] == 1 and segments[-1][1] is None
+    for (_, end), (next_start, _) in zip(segments, segments[1:]):
+        assert next_start == end + 1
+
+def test_boundaries_snap_to_keyframes():
+    keyframes = [1, 240, 490, 760, 1000]
+    assert [start for start, _ in plan_segments(1000, 4, keyframes)] == [1, 240, 490, 760]
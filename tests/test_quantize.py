@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+sys.path.insert(0, str(ROOT / "models"))
+
+pytest.importorskip("cv2")
+pytest.importorskip("yaml")
+
+from detection import PPEDetector
+from inference_backends import OnnxRuntimeBackend
+from quantize import calibration_tensor
+
+
+@pytest.mark.parametrize("shape", [(750, 1000, 3), (480, 640, 3), (200, 300, 3)])
+def test_calibration_matches_the_served_tensor(shape):
+    image = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    image[..., 0] = 0  # A channel swap anywhere would change the tensor
+    # The two serving steps, without loading a model
+    detector = object.__new__(PPEDetector)
+    backend = object.__new__(OnnxRuntimeBackend)
+    backend.input_dtype = np.float32
+    prepared, _, _ = detector._preprocess(image, 640)
+    served, _, _ = backend._preprocess([prepared], (640, 640))
+    assert np.array_equal(calibration_tensor(image, (640, 640)), served)
+    # Blue ends up last, i.e. the model sees RGB; only the grey letterbox border is left in it
+    assert set(np.unique(served[0, 2]).tolist()) <= {0.0, float(np.float32(114) / 255.0)}
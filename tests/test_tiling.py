@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from inference_backends import InferenceBackend, RawDetections
+from tiling import merge_detections, select_tiles, tile_grid
+
+
+def test_tile_grid_covers_4k_frame_with_overlap():
+    tiles = tile_grid(2160, 3840, tile_size=640, overlap=0.2)
+    assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in tiles)
+    assert max(x2 for _, _, x2, _ in tiles) == 3840
+    assert max(y2 for _, _, _, y2 in tiles) == 2160
+
+def test_small_frame_is_a_single_tile():
+    assert tile_grid(480, 600, tile_size=640) == [(0, 0, 600, 480)]
+
+def test_select_tiles_keeps_only_tiles_with_coarse_boxes():
+    tiles = tile_grid(1280, 1280, tile_size=640, overlap=0.0)
+    boxes = np.array([[700, 700, 760, 780]], dtype=np.float32)
+    assert select_tiles(tiles, boxes, np.array([0.5]), max_tiles=4) == [(640, 640, 1280, 1280)]
+
+def test_merge_removes_duplicates_cut_at_tile_borders():
+    full = RawDetections(np.array([[10, 10, 110, 110]], np.float32), np.array([0.9], np.float32), np.array([1]))
+    cut = RawDetections(np.array([[0, 10, 60, 110]], np.float32), np.array([0.7], np.float32), np.array([1]))
+    other_class = RawDetections(np.array([[0, 10, 60, 110]], np.float32), np.array([0.8], np.float32), np.array([2]))
+    merged = merge_detections([full, cut, other_class], [(0, 0), (50, 0), (50, 0)], 0.6, max_det=10)
+    assert merged.cls.tolist() == [1, 2]
+    assert merged.xyxy[0].tolist() == [10, 10, 110, 110]
+
+
+class FixedBoxBackend(InferenceBackend):
+    """Answers every input with one helmet box at fixed input coordinates and records the input sizes."""
+
+    def __init__(self, box, helmet_id):
+        super().__init__(None, {})
+        self.box, self.helmet_id, self.input_shapes = box, helmet_id, []
+
+    def predict(self, images, conf, iou, imgsz, augment=False, max_det=300):
+        self.input_shapes.extend(image.shape[:2] for image in images)
+        return [RawDetections(np.array([self.box], np.float32), np.array([0.9], np.float32),
+                              np.array([self.helmet_id])) for _ in images]
+
+def test_untiled_frames_of_a_tiled_profile_come_back_in_frame_coordinates(monkeypatch):
+    pytest.importorskip("cv2")
+    from config import load_config
+    from detection import PPEDetector
+    config = load_config()
+    backend = FixedBoxBackend([64, 128, 128, 176], config["models"]["classes"].index("helmet"))
+    monkeypatch.setattr(PPEDetector, "_load_model", lambda self: backend)
+    detector = PPEDetector(config)
+    backend.input_shapes.clear()
+
+    # 1000x750 is below tiling.min_size, so it is letterboxed to 640x480 plus 80 px of padding top and bottom
+    frame = np.zeros((750, 1000, 3), dtype=np.uint8)
+    raw = detector._predict_raw([frame], detector.resolve_profile("highres"), 0.5)[0]
+    assert backend.input_shapes == [(640, 640)]
+    assert raw.xyxy[0].tolist() == [100, 75, 200, 150]
+
+    small = detector._predict_raw([frame[:480, :640]], detector.resolve_profile("highres"), 0.5)[0]
+    assert small.xyxy[0].tolist() == [64, 128, 128, 176]
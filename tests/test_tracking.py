@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from inference_backends import RawDetections
+from tracking import IoUTracker
+
+
+def _detections(boxes, classes):
+    return RawDetections(np.array(boxes, dtype=np.float32), np.full(len(boxes), 0.9, dtype=np.float32),
+                         np.array(classes, dtype=np.int64))
+
+def test_track_ids_are_stable_across_frames():
+    tracker = IoUTracker()
+    first = tracker.update(_detections([[0, 0, 50, 50], [100, 100, 150, 150]], [0, 1]))
+    second = tracker.update(_detections([[102, 101, 152, 151], [2, 1, 52, 51]], [1, 0]))
+    assert list(second) == [first[1], first[0]]
+
+def test_tracks_do_not_match_across_classes():
+    tracker = IoUTracker()
+    first = tracker.update(_detections([[0, 0, 50, 50]], [0]))
+    second = tracker.update(_detections([[0, 0, 50, 50]], [1]))
+    assert second[0] != first[0]
+    assert tracker.lost
+
+def test_predict_propagates_live_tracks():
+    tracker = IoUTracker()
+    ids = tracker.update(_detections([[0, 0, 50, 50]], [3]))
+    detections, predicted_ids = tracker.predict()
+    assert list(predicted_ids) == list(ids)
+    assert detections.cls.tolist() == [3]
+    assert np.allclose(detections.xyxy[0], [0, 0, 50, 50], atol=1.0)
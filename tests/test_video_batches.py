@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+cv2 = pytest.importorskip("cv2")
+
+from config import load_config
+from detection import PPEDetector
+from inference_backends import InferenceBackend, RawDetections
+
+
+class BrightFrameFails(InferenceBackend):
+    """Finds nothing, and raises for any call that includes a white frame."""
+
+    def __init__(self):
+        super().__init__(None, {})
+
+    def predict(self, images, conf, iou, imgsz, augment=False, max_det=300):
+        if any(image.mean() > 200 for image in images):
+            raise RuntimeError("corrupt frame")
+        return [RawDetections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+                for _ in images]
+
+
+def test_one_bad_frame_does_not_drop_its_batch(tmp_path, monkeypatch):
+    video = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    for index in range(12):
+        writer.write(np.full((48, 64, 3), 255 if index == 4 else 40, dtype=np.uint8))
+    writer.release()
+
+    monkeypatch.setattr(PPEDetector, "_load_model", lambda self: BrightFrameFails())
+    config = load_config()
+    config["detection"]["batch_size"] = 8
+    detector = PPEDetector(config)
+    frames = [result.frame_number for result in detector.iter_video_detections(
+        video, motion_gate=False, checkpoint=False, adaptive=False, detect_interval=1)]
+    assert frames == [1, 2, 3, 4, 6, 7, 8, 9, 10, 11, 12]
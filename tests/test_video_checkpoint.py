@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import video_checkpoint
+from video_checkpoint import concat_parts, part_path
+
+
+def test_no_parts_is_a_clear_error(tmp_path):
+    output = str(tmp_path / "out.mp4")
+    with pytest.raises(ValueError, match="No segment files"):
+        concat_parts([], output, 30.0, (64, 48))
+    with pytest.raises(ValueError):
+        concat_parts([str(tmp_path / part_path("out.mp4", 0))], output, 30.0, (64, 48))  # Never written
+
+def test_single_part_is_renamed_without_remuxing(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_checkpoint.shutil, "which", lambda name: pytest.fail("ffmpeg should not run"))
+    part = tmp_path / part_path("out.mp4", 0)
+    part.write_bytes(b"segment")
+    concat_parts([str(part)], str(tmp_path / "out.mp4"), 30.0, (64, 48))
+    assert (tmp_path / "out.mp4").read_bytes() == b"segment" and not part.exists()
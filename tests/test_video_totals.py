@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from video_pipeline import VideoTotals
+
+
+def _violation(confidence, track_id=None):
+    violation = {"violation_type": "no_helmet", "confidence": confidence, "critical": True}
+    if track_id is not None:
+        violation["track_id"] = track_id
+    return violation
+
+def test_resumed_totals_match_one_run():
+    frames = [[_violation(0.1 * i, track_id=i % 3)] if i % 2 else [] for i in range(1, 50)]
+    whole = VideoTotals()
+    for violations in frames:
+        whole.add_frame(violations, detections=2)
+
+    first = VideoTotals()
+    for violations in frames[:20]:
+        first.add_frame(violations, detections=2)
+    resumed = VideoTotals.from_state(first.to_state())
+    for violations in frames[20:]:
+        resumed.add_frame(violations, detections=2)
+
+    assert resumed.summary(49, 30.0) == whole.summary(49, 30.0)
+    assert resumed.violation_track_ids == {0, 1, 2}
+
+def test_empty_video():
+    summary = VideoTotals().summary(0, 30.0)
+    assert summary["avg_confidence"] == 0.0 and summary["compliance_rate"] == 1.0
+    assert summary["processing_fps"] == 0
+
+def test_columns_match_dicts():
+    from violation_batch import ViolationBatch
+    violations = [_violation(0.1 * i, track_id=i % 3 if i % 2 else None) for i in range(1, 50)]
+    violations[3]["critical"] = False
+    from_dicts = VideoTotals()
+    for violation in violations:
+        from_dicts.add_violation(violation)
+    records = ViolationBatch.from_dicts(violations).records
+    from_columns = VideoTotals()
+    from_columns.add_columns(records["confidence"], records["critical"], records["track_id"], chunk=7)
+    assert from_columns.to_state() == from_dicts.to_state()
@@ -0,0 +1,38 @@
+import pickle
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from violation_batch import ViolationBatch
+
+VIOLATIONS = [
+    {"violation_type": "no_helmet", "confidence": 0.8, "bbox": (5, 5, 50, 60), "critical": True, "track_id": 3,
+     "timestamp": 0.5, "frame": 16, "frame_time": 0.5},
+    {"violation_type": "missing_mask", "confidence": 0.9, "bbox": None, "critical": True,
+     "timestamp": 0.5, "frame": 16, "frame_time": 0.5},
+    {"violation_type": "no_helmet", "confidence": 0.6, "bbox": (1, 2, 3, 4), "critical": False,
+     "timestamp": 1.0, "frame": 31, "frame_time": 1.0}
+]
+
+
+def test_dict_round_trip():
+    batch = ViolationBatch.from_dicts(VIOLATIONS)
+    assert batch.to_dicts() == VIOLATIONS
+    assert pickle.loads(pickle.dumps(batch)).to_dicts() == VIOLATIONS
+
+def test_concat_remaps_types():
+    first = ViolationBatch.from_dicts(VIOLATIONS[1:2])
+    second = ViolationBatch.from_dicts(VIOLATIONS[::2])
+    assert ViolationBatch.concat([first, second]).to_dicts() == VIOLATIONS[1:2] + VIOLATIONS[::2]
+
+def test_aggregates():
+    batch = ViolationBatch()
+    for _ in range(100):
+        batch.append(VIOLATIONS)
+    summary = batch.summary(processed_frames=200)
+    assert summary["violations_by_type"] == {"no_helmet": 200, "missing_mask": 100}
+    assert summary["critical_violations"] == 200
+    assert summary["violation_frames"] == 2 and summary["max_violations_per_frame"] == 200
+    assert abs(batch.confidence_stats("no_helmet")["mean"] - 0.7) < 1e-9
+    assert batch.nbytes < 100 * len(batch)